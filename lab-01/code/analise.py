@@ -1,9 +1,63 @@
 import os
+import sys
 from datetime import datetime
-import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from shared.chart_farm import ChartJob, render_charts
+from shared.columnar_store import load_table
+from csv_controller import SCHEMA
+
+# (título, coluna para mediana/média, coluna para moda, escala)
+# A RQ05 não tem coluna numérica: é respondida com a contagem de linguagens
+RQ_METRICAS = [
+    ("RQ01 - Idade dos repositorios (anos)", "idade_anos", "idade_anos_round", 1),
+    ("RQ02 - Pull Requests Aceitos", "mergedPRs", "mergedPRs", 1),
+    ("RQ03 - Releases", "releases", "releases", 1),
+    ("RQ04 - Dias desde ultima atualizacao", "dias_desde_update", "dias_desde_update", 1),
+    ("RQ05 - Linguagens mais usadas", None, None, None),
+    ("RQ06 - Percentual de Issues Fechadas", "ratio_closed_issues", "ratio_closed_issues", 100),
+]
+
+# (título, coluna) comparados entre linguagens populares e as demais
+RQ07_METRICAS = [
+    ("Pull Requests Aceitos", "mergedPRs"),
+    ("Releases", "releases"),
+    ("Dias desde ultima atualizacao", "dias_desde_update"),
+]
+
+
+def calcular_estatisticas(df, colunas, grupo=None, agregacoes=("median", "mean", "mode")):
+    """
+    Calcula as agregações pedidas para todas as colunas e todos os grupos
+    sobre os dados em formato longo: uma passada agrupada para as agregações
+    nativas do pandas e uma contagem por valor para a moda.
+    Retorna um DataFrame indexado por (grupo, coluna), com uma coluna por
+    agregação. Sem `grupo`, todas as linhas ficam no grupo "Todos".
+    """
+    chave = df[grupo].to_numpy() if grupo is not None else np.full(len(df), "Todos")
+    longo = (
+        df[colunas].astype(float)
+        .assign(grupo=chave)
+        .melt(id_vars="grupo", var_name="coluna", value_name="valor")
+        .dropna(subset=["valor"])
+    )
+
+    # Todas as agregações nativas (mediana, média, ...) em uma só passada agrupada
+    simples = [a for a in agregacoes if a != "mode"]
+    stats = longo.groupby(["grupo", "coluna"])["valor"].agg(simples) if simples else None
+
+    if "mode" in agregacoes:
+        # Moda = valor mais frequente; nos empates fica o menor, como em Series.mode()[0]
+        contagem = longo.groupby(["grupo", "coluna", "valor"]).size().rename("n").reset_index()
+        contagem = contagem.sort_values(["grupo", "coluna", "n", "valor"], ascending=[True, True, False, True])
+        moda = contagem.drop_duplicates(["grupo", "coluna"]).set_index(["grupo", "coluna"])["valor"].rename("mode")
+        stats = moda.to_frame() if stats is None else stats.join(moda)
+
+    return stats[list(agregacoes)]
+
+
 def analisar_repositorios(data_path: str):
     if not os.path.exists(data_path):
         print(f"Arquivo {data_path} não encontrado.")
@@ -15,11 +69,8 @@ def analisar_repositorios(data_path: str):
     file_stem = os.path.splitext(os.path.basename(data_path))[0]
     metrics_path = os.path.join(charts_dir, f"metrics{file_stem}.txt")
     
-    if(os.path.exists(metrics_path)):
-        with open(metrics_path, "w") as f:
-            f.write("")
-
-    df = pd.read_csv(data_path)
+    # Leitura tipada: as datas já chegam convertidas e o Parquet é reaproveitado
+    df = load_table(data_path, SCHEMA)
 
     # Conversões de datas
     df["createdAt"] = pd.to_datetime(df["createdAt"]).dt.tz_localize(None)
@@ -29,115 +80,91 @@ def analisar_repositorios(data_path: str):
     df["idade_anos"] = (datetime.now() - df["createdAt"]).dt.days / 365
     df["idade_anos_round"] = df["idade_anos"].round(0)
     df["dias_desde_update"] = (datetime.now() - df["updatedAt"]).dt.days
-    df["ratio_closed_issues"] = df["closedIssues"] / df["totalIssues"].replace(0, pd.NA)
+    df["ratio_closed_issues"] = df["closedIssues"] / df["totalIssues"].replace(0, np.nan)
 
     # =======================
     # Estatísticas RQ01 a RQ06
     # =======================
-    print_and_write(metrics_path, "===== RQ01 - Idade dos repositorios (anos) =====\n")
-    print_and_write(metrics_path, "Mediana: {}\n".format(round(df["idade_anos"].median(), 2)))
-    print_and_write(metrics_path, "Media: {}\n".format(round(df["idade_anos"].mean(), 2)))
-    print_and_write(metrics_path, "Moda: {}\n".format(round(df["idade_anos_round"].mode()[0], 2)))
-
-
-    print_and_write(metrics_path, "===== RQ02 - Pull Requests Aceitos =====\n")
-    print_and_write(metrics_path, "Mediana: {}\n".format(round(df["mergedPRs"].median(), 2)))
-    print_and_write(metrics_path, "Media: {}\n".format(round(df["mergedPRs"].mean(), 2)))
-    print_and_write(metrics_path, "Moda: {}\n".format(round(df["mergedPRs"].mode()[0], 2)))
-
-    print_and_write(metrics_path, "===== RQ03 - Releases =====\n")
-    print_and_write(metrics_path, "Mediana: {}\n".format(round(df["releases"].median(), 2)))
-    print_and_write(metrics_path, "Media: {}\n".format(round(df["releases"].mean(), 2)))
-    print_and_write(metrics_path, "Moda: {}\n".format(round(df["releases"].mode()[0], 2)))
-
-    print_and_write(metrics_path, "===== RQ04 - Dias desde ultima atualizacao =====\n")
-    print_and_write(metrics_path, "Mediana: {}\n".format(round(df["dias_desde_update"].median(), 2)))
-    print_and_write(metrics_path, "Media: {}\n".format(round(df["dias_desde_update"].mean(), 2)))
-    print_and_write(metrics_path, "Moda: {}\n".format(round(df["dias_desde_update"].mode()[0], 2)))
-
-    print_and_write(metrics_path, "===== RQ05 - Linguagens mais usadas =====\n")
-    print_and_write(metrics_path, "{}\n".format(df["primaryLanguage"].value_counts()))
-
-    print_and_write(metrics_path, "===== RQ06 - Percentual de Issues Fechadas =====\n")
-    print_and_write(metrics_path, "Mediana: {}\n".format(round(df["ratio_closed_issues"].median() * 100, 2)))
-    print_and_write(metrics_path, "Media: {}\n".format(round(df["ratio_closed_issues"].mean() * 100, 2)))
-    print_and_write(metrics_path, "Moda: {}\n".format(round(df["ratio_closed_issues"].mode()[0] * 100, 2)))
+    # Todas as agregações saem de uma única passada; o relatório é montado em
+    # memória e gravado de uma vez no final
+    report = []
+    colunas = list(dict.fromkeys(
+        c for _, coluna, coluna_moda, _ in RQ_METRICAS for c in (coluna, coluna_moda) if c is not None
+    ))
+    stats = calcular_estatisticas(df, colunas).loc["Todos"]
+    contagem_linguagens = df["primaryLanguage"].value_counts()
+
+    for titulo, coluna, coluna_moda, escala in RQ_METRICAS:
+        report.append(f"===== {titulo} =====\n")
+        if coluna is None:
+            report.append("{}\n".format(contagem_linguagens))
+            continue
+
+        moda = stats.loc[coluna_moda, "mode"] * escala
+        if pd.api.types.is_integer_dtype(df[coluna_moda]):
+            moda = int(moda)
+        report.append("Mediana: {}\n".format(round(stats.loc[coluna, "median"] * escala, 2)))
+        report.append("Media: {}\n".format(round(stats.loc[coluna, "mean"] * escala, 2)))
+        report.append("Moda: {}\n".format(round(moda, 2)))
 
     # =======================
     # Gráficos principais
     # =======================
-    # Idade dos repositórios
-
-    df["idade_anos"].hist(bins=15)
-    plt.title("Distribuição da Idade dos Repositórios (anos)")
-    plt.xlabel("Idade (anos)")
-    plt.ylabel("Quantidade")
-    plt.savefig(os.path.join(charts_dir, f"idade_{file_stem}.png"))
-    plt.close()
-
-    # Pull Requests Aceitos
-    df["mergedPRs"].dropna().hist(bins=30)
-    plt.title("Distribuição Pull Requests Aceitos")
-    plt.xlabel("Pull Requests Aceitos")
-    plt.ylabel("Quantidade")
-    plt.savefig(os.path.join(charts_dir, f"pull_requests_aceitos_{file_stem}.png"))
-    plt.close()
-
-    # Pull Requests Aceitos 90%
+    # Cada gráfico vira um job declarativo, renderizado em paralelo
     s = df["mergedPRs"].dropna()
     limite = s.quantile(0.9)  # valor do percentil 90
-
     x = np.sort(s[s <= limite])
     y = np.arange(1, len(x)+1) / len(x)
-    plt.plot(x, y, marker=".", linestyle="none")
-    plt.title("ECDF de Pull Requests Aceitos (até o 90º percentil)")
-    plt.xlabel("Pull Requests Aceitos")
-    plt.ylabel("Proporção acumulada")
-    plt.savefig(os.path.join(charts_dir, f"pull_requests_aceitos_ECDF_{file_stem}.png"))
-    plt.close()
-
-    # Top linguagens
-    df["primaryLanguage"].value_counts().head(5).plot(kind="bar", figsize=(7, 8))
-    plt.title("Top 5 Linguagens Mais Populares")
-    plt.ylabel("Quantidade")
-    plt.xlabel("Linguagem")
-    plt.savefig(os.path.join(charts_dir, f"linguagens_{file_stem}.png"))
-    plt.close()
-
-    # Percentual de issues fechadas
-    df["ratio_closed_issues"].dropna().hist(bins=15)
-    plt.title("Distribuição da Razão de Issues Fechadas")
-    plt.xlabel("Proporção")
-    plt.ylabel("Quantidade")
-    plt.savefig(os.path.join(charts_dir, f"issues_fechadas_{file_stem}.png"))
-    plt.close()
+    top_linguagens = contagem_linguagens.head(5)
+
+    jobs = [
+        # Idade dos repositórios
+        ChartJob(os.path.join(charts_dir, f"idade_{file_stem}.png"), "hist",
+                 args=(df["idade_anos"].dropna().to_numpy(),), kwargs={"bins": 15}, grid=True,
+                 title="Distribuição da Idade dos Repositórios (anos)", xlabel="Idade (anos)", ylabel="Quantidade"),
+        # Pull Requests Aceitos
+        ChartJob(os.path.join(charts_dir, f"pull_requests_aceitos_{file_stem}.png"), "hist",
+                 args=(s.to_numpy(),), kwargs={"bins": 30}, grid=True,
+                 title="Distribuição Pull Requests Aceitos", xlabel="Pull Requests Aceitos", ylabel="Quantidade"),
+        # Pull Requests Aceitos 90%
+        ChartJob(os.path.join(charts_dir, f"pull_requests_aceitos_ECDF_{file_stem}.png"), "plot",
+                 args=(x, y), kwargs={"marker": ".", "linestyle": "none"},
+                 title="ECDF de Pull Requests Aceitos (até o 90º percentil)", xlabel="Pull Requests Aceitos",
+                 ylabel="Proporção acumulada"),
+        # Top linguagens
+        ChartJob(os.path.join(charts_dir, f"linguagens_{file_stem}.png"), "bar",
+                 args=(top_linguagens.index.tolist(), top_linguagens.to_numpy()), figsize=(7, 8), xtick_rotation=90,
+                 title="Top 5 Linguagens Mais Populares", xlabel="Linguagem", ylabel="Quantidade"),
+        # Percentual de issues fechadas
+        ChartJob(os.path.join(charts_dir, f"issues_fechadas_{file_stem}.png"), "hist",
+                 args=(df["ratio_closed_issues"].dropna().to_numpy(),), kwargs={"bins": 15}, grid=True,
+                 title="Distribuição da Razão de Issues Fechadas", xlabel="Proporção", ylabel="Quantidade"),
+    ]
+    render_charts(jobs)
 
     print(f"\nGráficos salvos em {charts_dir}")
 
     # =======================
     # Bônus RQ07 - Por linguagem
     # =======================
-    print_and_write(metrics_path, "\n===== RQ07 - Metricas por Linguagem =====\n")
-    linguagens_populares = df["primaryLanguage"].value_counts().head(5).index.tolist()
-    print_and_write(metrics_path, "Linguagens mais populares: {}\n".format(linguagens_populares))
+    report.append("\n===== RQ07 - Metricas por Linguagem =====\n")
+    linguagens_populares = contagem_linguagens.head(5).index.tolist()
+    report.append("Linguagens mais populares: {}\n".format(linguagens_populares))
 
-    df_populares = df[df["primaryLanguage"].isin(linguagens_populares)]
-    df_outras = df[~df["primaryLanguage"].isin(linguagens_populares)]
+    df["grupo_linguagem"] = np.where(df["primaryLanguage"].isin(linguagens_populares), "Populares", "Outras")
+    medianas = calcular_estatisticas(df, [c for _, c in RQ07_METRICAS], grupo="grupo_linguagem", agregacoes=("median",))["median"]
 
-    print_and_write(metrics_path, "\n--- Pull Requests Aceitos ---\n")
-    print_and_write(metrics_path, "Populares: {}\n".format(df_populares["mergedPRs"].median()))
-    print_and_write(metrics_path, "Outras: {}\n".format(df_outras["mergedPRs"].median()))
+    for titulo, coluna in RQ07_METRICAS:
+        report.append(f"\n--- {titulo} ---\n")
+        report.append("Populares: {}\n".format(medianas.get(("Populares", coluna), np.nan)))
+        report.append("Outras: {}\n".format(medianas.get(("Outras", coluna), np.nan)))
 
-    print_and_write(metrics_path, "\n--- Releases ---\n")
-    print_and_write(metrics_path, "Populares: {}\n".format(df_populares["releases"].median()))
-    print_and_write(metrics_path, "Outras: {}\n".format(df_outras["releases"].median()))
+    write_report(metrics_path, report)
 
-    print_and_write(metrics_path, "\n--- Dias desde ultima atualizacao ---\n")
-    print_and_write(metrics_path, "Populares: {}\n".format(df_populares["dias_desde_update"].median()))
-    print_and_write(metrics_path, "Outras: {}\n".format(df_outras["dias_desde_update"].median()))
 
+def write_report(file_path, contents):
+    text = "".join(contents)
+    with open(file_path, "w") as f:
+        f.write(text)
+    print(text)
 
-def print_and_write(file_path, content):
-    with open(file_path, "a") as f:
-        f.write(content)
-    print(content)
\ No newline at end of file
@@ -1,8 +1,44 @@
 import csv
 import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from shared.columnar_store import DATETIME
 
 data_dir = os.path.join(os.path.dirname(__file__), "../data")
 
+# Tipos das colunas, usados para a leitura tipada/colunar na análise
+SCHEMA = {
+    "nameWithOwner": "object",
+    "createdAt": DATETIME,
+    "updatedAt": DATETIME,
+    "primaryLanguage": "object",
+    "mergedPRs": "int64",
+    "releases": "int64",
+    "totalIssues": "int64",
+    "closedIssues": "int64",
+}
+
+HEADER = [
+    "nameWithOwner", "createdAt", "updatedAt",
+    "primaryLanguage", "mergedPRs", "releases",
+    "totalIssues", "closedIssues"
+]
+
+
+def repository_row(repo):
+    return [
+        repo['nameWithOwner'],
+        repo['createdAt'],
+        repo['updatedAt'],
+        repo['primaryLanguage']['name'] if repo['primaryLanguage'] else None,
+        repo['pullRequests']['totalCount'],
+        repo['releases']['totalCount'],
+        repo['issues']['totalCount'],
+        repo['closedIssues']['totalCount']
+    ]
+
+
 def save_to_csv(repositories):
     # Salva no diretório ../data
     os.makedirs(data_dir, exist_ok=True)
@@ -10,22 +46,36 @@ def save_to_csv(repositories):
 
     with open(file_path, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
-        writer.writerow([
-            "nameWithOwner", "createdAt", "updatedAt",
-            "primaryLanguage", "mergedPRs", "releases",
-            "totalIssues", "closedIssues"
-        ])
-        for repo in repositories:
-            writer.writerow([
-                repo['nameWithOwner'],
-                repo['createdAt'],
-                repo['updatedAt'],
-                repo['primaryLanguage']['name'] if repo['primaryLanguage'] else None,
-                repo['pullRequests']['totalCount'],
-                repo['releases']['totalCount'],
-                repo['issues']['totalCount'],
-                repo['closedIssues']['totalCount']
-            ])
+        writer.writerow(HEADER)
+        writer.writerows(repository_row(repo) for repo in repositories)
+    return file_path
+
+
+def stream_to_csv(pages, total_repos):
+    """
+    Grava as páginas no CSV conforme são geradas, mantendo em memória apenas
+    a página atual. O arquivo é descarregado a cada página, então pode ser
+    lido enquanto a coleta ainda está em andamento. Se vierem menos
+    repositórios que o pedido, o arquivo é renomeado para a quantidade real.
+    Retorna (caminho do arquivo, quantidade gravada).
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    file_path = os.path.join(data_dir, f"resultados{total_repos}Repos.csv")
+
+    count = 0
+    with open(file_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for page in pages:
+            writer.writerows(repository_row(repo) for repo in page)
+            count += len(page)
+            f.flush()
+
+    if count != total_repos:
+        final_path = os.path.join(data_dir, f"resultados{count}Repos.csv")
+        os.replace(file_path, final_path)
+        file_path = final_path
+    return file_path, count
 
 def list_saved_results():
     files = os.listdir(data_dir)
@@ -1,14 +1,24 @@
+import collections
+import concurrent.futures
 import os
+import sys
 import time
 
-import requests
 from dotenv import load_dotenv
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from shared.checkpoint import CursorCheckpoint
+from shared.github_client import GraphQLClient
+from shared.response_cache import ResponseCache
+
 # Carrega variáveis do .env
 load_dotenv()
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 
-if not GITHUB_TOKEN:
+# Cache em disco das respostas (GITHUB_OFFLINE=1 usa apenas o cache)
+cache = ResponseCache.from_env(os.path.join(os.path.dirname(__file__), "..", "data", "cache", "graphql"))
+
+if not GITHUB_TOKEN and not (cache and cache.offline):
     raise Exception("Erro: GITHUB_TOKEN não encontrado no arquivo .env")
 
 query = """
@@ -34,68 +44,238 @@ query ($pageSize: Int!, $afterCursor: String) {
 }
 """
 
-headers = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
+# Sessão HTTP compartilhada (keep-alive, gzip e retry centralizado)
+client = GraphQLClient(GITHUB_TOKEN, timeout=15, backoff=3, cache=cache)
 
 
-def fetch_repositories(total_repos=100):
-    results = []
-    page_size = 20
+def _post_graphql(query_text, variables):
+    data = client.execute(query_text, variables).get("search")
+    if not data:
+        raise Exception("Resposta inesperada da API: campo 'search' ausente")
+    return data
+
+
+checkpoint_dir = os.path.join(os.path.dirname(__file__), "..", "data", "checkpoints")
+
+
+def iter_repository_pages(total_repos=100, resume=True):
+    """
+    Gera as páginas de repositórios à medida que chegam da API, sem acumular
+    a coleta em memória. Cada página é confirmada em um checkpoint em disco;
+    com resume=True uma coleta interrompida reemite as páginas já confirmadas
+    e continua a partir do último cursor.
+    """
+    checkpoint = CursorCheckpoint(os.path.join(checkpoint_dir, f"fetch_repositories_{total_repos}.jsonl"))
+    if not resume:
+        checkpoint.clear()
+
+    emitted = 0
     after_cursor = None
+    has_next = True
+    for nodes, after_cursor, has_next in checkpoint.iter_pages():
+        nodes = nodes[:total_repos - emitted]
+        emitted += len(nodes)
+        yield nodes
+    if emitted:
+        print(f"[i] Retomando coleta a partir do checkpoint ({emitted} repositórios já coletados)")
 
-    while len(results) < total_repos:
+    page_size = 20
+    while has_next and emitted < total_repos:
         variables = {
             "pageSize": page_size,
             "afterCursor": after_cursor
         }
+        data = _post_graphql(query, variables)
 
-        # Tentativa com retry automático
-        for tentativa in range(3):
-            try:
-                response = requests.post(
-                    "https://api.github.com/graphql",
-                    json={"query": query, "variables": variables},
-                    headers=headers,
-                    timeout=15  # evita travar indefinidamente
-                )
-
-                if response.status_code == 200:
-                    break
-                else:
-                    print(f"[AVISO] Falha {response.status_code}, tentativa {tentativa+1}/3")
-                    print(f"[DEBUG] Conteúdo da resposta: {response.text}")
-                    time.sleep(3)
-
-            except requests.exceptions.RequestException as e:
-                print(f"[ERRO] Problema de conexão: {e}, tentativa {tentativa+1}/3")
-                time.sleep(3)
-        else:
-            print(f"[ERRO] Query falhou após 3 tentativas. Última resposta:")
-            print(f"Status: {response.status_code}")
-            print(f"Headers: {response.headers}")
-            print(f"Body: {response.text}")
-            raise Exception(f"Query falhou após 3 tentativas: {response.status_code}, {response.text}")
+        after_cursor = data["pageInfo"]["endCursor"]
+        has_next = data["pageInfo"]["hasNextPage"]
+        checkpoint.commit(data["nodes"], after_cursor, has_next)
 
-        try:
-            data = response.json().get("data", {}).get("search", None)
-        except Exception as e:
-            print(f"[ERRO] Falha ao decodificar JSON da resposta: {e}")
-            print(f"Resposta bruta: {response.text}")
-            raise
-        if not data:
-            print(f"[ERRO] Resposta inesperada da API:")
-            print(f"Status: {response.status_code}")
-            print(f"Headers: {response.headers}")
-            print(f"Body: {response.text}")
-            raise Exception(f"Resposta inesperada da API: {response.text}")
-
-        results.extend(data["nodes"])
+        nodes = data["nodes"][:total_repos - emitted]
+        emitted += len(nodes)
+        yield nodes
+
+        if has_next and not client.last_cached:
+            time.sleep(1)  # evita sobrecarregar a API
+
+    checkpoint.clear()
+
+
+def fetch_repositories(total_repos=100, resume=True):
+    results = []
+    for page in iter_repository_pages(total_repos, resume=resume):
+        results.extend(page)
+    return results
+
+
+# =======================
+# Busca particionada por faixas de estrelas
+# =======================
+# A busca do GitHub devolve no máximo 1000 resultados por consulta. Para ir além
+# disso, o espaço de estrelas é dividido em faixas disjuntas "stars:A..B", cada
+# uma com menos de 1000 repositórios, e as faixas são percorridas em paralelo.
+
+SEARCH_LIMIT = 1000
+
+count_query = """
+query ($searchQuery: String!) {
+  search(query: $searchQuery, type: REPOSITORY, first: 1) {
+    repositoryCount
+    nodes {
+      ... on Repository {
+        stargazerCount
+      }
+    }
+  }
+}
+"""
+
+range_query = """
+query ($searchQuery: String!, $pageSize: Int!, $afterCursor: String) {
+  search(query: $searchQuery, type: REPOSITORY, first: $pageSize, after: $afterCursor) {
+    nodes {
+      ... on Repository {
+        nameWithOwner
+        stargazerCount
+        createdAt
+        updatedAt
+        primaryLanguage { name }
+        pullRequests(states: MERGED) { totalCount }
+        releases { totalCount }
+        issues { totalCount }
+        closedIssues: issues(states: CLOSED) { totalCount }
+      }
+    }
+    pageInfo {
+      endCursor
+      hasNextPage
+    }
+  }
+}
+"""
+
+
+def _range_search(lower, upper):
+    return f"stars:{lower}..{upper} sort:stars"
+
+
+def _count_range(lower, upper):
+    data = _post_graphql(count_query, {"searchQuery": _range_search(lower, upper)})
+    return data["repositoryCount"]
+
+
+def _max_stars(min_stars):
+    data = _post_graphql(count_query, {"searchQuery": f"stars:>={min_stars} sort:stars"})
+    if not data["nodes"]:
+        return None
+    return data["nodes"][0]["stargazerCount"]
+
+
+def plan_star_ranges(total_repos, min_stars=2):
+    """
+    Divide o espaço de estrelas em faixas disjuntas, da mais popular para a
+    menos popular, até cobrir total_repos repositórios. Cada faixa é ajustada
+    para ficar abaixo do limite de 1000 resultados da busca.
+    Retorna uma lista de tuplas (inicio, fim, quantidade).
+    """
+    upper = _max_stars(min_stars)
+    if upper is None:
+        return []
+
+    ranges = []
+    planned = 0
+    width = max(1, upper // 2)
+    while upper >= min_stars and planned < total_repos:
+        lower = max(min_stars, upper - width + 1)
+        count = _count_range(lower, upper)
+
+        # Estreita a faixa enquanto ela ultrapassar o limite da busca
+        while count > SEARCH_LIMIT and lower < upper:
+            lower = (lower + upper + 1) // 2
+            count = _count_range(lower, upper)
+
+        if count > SEARCH_LIMIT:
+            print(f"[AVISO] Faixa stars:{lower}..{upper} tem {count} repositórios; apenas {SEARCH_LIMIT} serão retornados")
+
+        ranges.append((lower, upper, count))
+        planned += min(count, SEARCH_LIMIT)
+
+        # A próxima faixa começa com o dobro da largura da atual; se estiver
+        # densa demais ela será estreitada na próxima iteração
+        width = (upper - lower + 1) * 2
+        upper = lower - 1
+
+    return ranges
+
+
+def fetch_star_range(lower, upper, page_size=50):
+    results = []
+    after_cursor = None
+
+    while len(results) < SEARCH_LIMIT:
+        variables = {
+            "searchQuery": _range_search(lower, upper),
+            "pageSize": page_size,
+            "afterCursor": after_cursor
+        }
+        data = _post_graphql(range_query, variables)
+
+        results.extend(node for node in data["nodes"] if node)
 
         if not data["pageInfo"]["hasNextPage"]:
             break
 
         after_cursor = data["pageInfo"]["endCursor"]
-        remaining = total_repos - len(results)
+        if not client.last_cached:
+            time.sleep(1)  # evita sobrecarregar a API
+
+    return results
+
+
+def iter_repositories_partitioned(total_repos=10000, max_workers=8, min_stars=2):
+    """
+    Gera os repositórios faixa a faixa, da mais popular para a menos popular,
+    para que o chamador grave cada uma assim que ela termina. Até max_workers
+    faixas são buscadas em paralelo e só elas ficam em memória (no máximo
+    1000 repositórios cada); dos repositórios já emitidos guarda-se apenas o nome.
+    """
+    ranges = [(lower, upper) for lower, upper, count in plan_star_ranges(total_repos, min_stars=min_stars) if count > 0]
+    print(f"[i] {len(ranges)} faixas de estrelas planejadas")
+
+    seen = set()
+    pending = collections.deque()
+    remaining = iter(ranges)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit_next():
+            star_range = next(remaining, None)
+            if star_range is not None:
+                pending.append((star_range, executor.submit(fetch_star_range, *star_range)))
 
-        time.sleep(1)  # evita sobrecarregar a API
+        for _ in range(max_workers):
+            submit_next()
 
-    return results[:total_repos]
+        try:
+            while pending and len(seen) < total_repos:
+                (lower, upper), future = pending.popleft()
+                nodes = future.result()
+                submit_next()
+
+                page = []
+                for repo in nodes:
+                    if len(seen) >= total_repos:
+                        break
+                    if repo["nameWithOwner"] not in seen:
+                        seen.add(repo["nameWithOwner"])
+                        page.append(repo)
+                print(f"[i] Faixa stars:{lower}..{upper} concluída ({len(nodes)} repositórios, {len(seen)} no total)")
+                yield page
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def fetch_repositories_partitioned(total_repos=10000, max_workers=8, min_stars=2):
+    results = []
+    for page in iter_repositories_partitioned(total_repos, max_workers=max_workers, min_stars=min_stars):
+        results.extend(page)
+    return results
@@ -1,5 +1,5 @@
-from github_graphql import fetch_repositories
-from csv_controller import (save_to_csv, list_saved_results)
+from github_graphql import (iter_repository_pages, iter_repositories_partitioned)
+from csv_controller import (stream_to_csv, list_saved_results)
 from analise import analisar_repositorios
 
 def print_main_menu():
@@ -16,15 +16,20 @@ if __name__ == '__main__':
             option = print_main_menu()
             print("\n")
             if(option == "1"):
-                n_repos = int(input("Quantos repositórios deseja buscar? (Entre 10 e 1000) ").strip())
-                if n_repos not in range(10, 1001):
-                    print("Escolha inválida. Digite um número entre 10 e 1000.")
+                n_repos = int(input("Quantos repositórios deseja buscar? (Entre 10 e 50000) ").strip())
+                if n_repos not in range(10, 50001):
+                    print("Escolha inválida. Digite um número entre 10 e 50000.")
                     exit()
 
                 print(f"Buscando dados dos {n_repos} repositórios mais populares...")
-                repositorios = fetch_repositories(n_repos)
-                save_to_csv(repositorios)
-                print(f"Dados salvos em ../data/resultados{n_repos}Repos.csv")
+                if n_repos <= 1000:
+                    pages = iter_repository_pages(n_repos)
+                else:
+                    # Acima do limite de 1000 resultados da busca, divide por faixas de estrelas
+                    pages = iter_repositories_partitioned(n_repos)
+                # Cada página (ou faixa) é gravada no CSV assim que chega
+                file_path, _ = stream_to_csv(pages, n_repos)
+                print(f"Dados salvos em {file_path}")
 
             elif(option == "2"):
                 raw_data = list_saved_results()
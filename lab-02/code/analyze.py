@@ -1,197 +1,239 @@
 import os
+import sys
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
+from functools import cached_property
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from shared.chart_farm import ChartJob, render_charts
+from shared.columnar_store import load_table
+from csv_controller import SCHEMA
+from ck_index import SUMMARY_COLUMNS, update_ck_index
 
 # ===== CONFIGURAÇÃO =====
 backup_original_csv = "../data/raw_repos/resultados1000repos.csv"
 ck_base_dir = os.path.join(os.path.expanduser("~"), "Desktop", "ck_m")
 metrics_path = os.path.join("../data", "final_metrics.txt")
+ck_index_path = os.path.join("../data", "ck_index.csv")
 
 
 # ===== FUNÇÕES AUXILIARES =====
 def load_original_data(path):
-    df = pd.read_csv(path)
+    # Apenas as colunas usadas na análise, já tipadas
+    df = load_table(path, SCHEMA, columns=["nameWithOwner", "createdAt", "releases", "stargazerCount"])
     df["createdAt"] = pd.to_datetime(df["createdAt"]).dt.tz_localize(None)
     df["age_years"] = (datetime.now() - df["createdAt"]).dt.days // 365
     return df
 
-def load_ck_data(repo_name):
-    repo_dir = os.path.join(ck_base_dir, repo_name.replace("/", "_"), "ck_output")
-    class_csv = os.path.join(repo_dir, "class.csv")
-    if os.path.exists(class_csv):
-        df_class = pd.read_csv(class_csv)
-        if df_class.empty:
-            return None
-        return df_class
-    return None
-
-def aggregate_ck_metrics(df_class):
-    return {
-        "loc": df_class["loc"].sum(),
-        "cbo_mean": df_class["cbo"].mean(),
-        "dit_mean": df_class["dit"].mean(),
-        "lcom_mean": df_class["lcom"].mean(),
-    }
-
 # ===== FUNÇÃO DE CONSOLIDAÇÃO =====
 def consolidate_data(original_csv):
     df_original = load_original_data(original_csv)
-    metrics = []
+    # Resumos do CK por repositório; só relê os class.csv novos ou alterados
+    ck_index = update_ck_index(df_original["nameWithOwner"], ck_base_dir, ck_index_path)
+    ck_index = ck_index[ck_index["classes"] > 0]
+
     valid_count = 0
     invalid_count = 0
-    for _, row in df_original.iterrows():
-        repo = row["nameWithOwner"]
-        df_class = load_ck_data(repo)
-        if df_class is None:
+    for repo in df_original["nameWithOwner"]:
+        if repo not in ck_index.index:
             print_and_write(content=f"[!] CK não encontrado para {repo}\n") 
             invalid_count += 1
             continue
-        agg = aggregate_ck_metrics(df_class)
-        agg["nameWithOwner"] = repo
-        metrics.append(agg)
         valid_count += 1
-    df_ck = pd.DataFrame(metrics)
+
+    df_ck = ck_index[SUMMARY_COLUMNS].astype({"loc": "int64"}).reset_index()
     df_final = df_original.merge(df_ck, on="nameWithOwner")
     print_and_write(content=f"[+] CK encontrado para {valid_count} repositórios\n")
     print_and_write(content=f"[!] CK não encontrado para {invalid_count} repositórios\n")
     return df_final
 
+# ===== CONTEXTO DA ANÁLISE =====
+class AnalysisContext:
+    """
+    Dataset final com os cálculos compartilhados entre as RQs.
+
+    Postos, matrizes de correlação, quartis e estatísticas descritivas são
+    calculados na primeira vez que alguma RQ pede e reaproveitados pelas
+    demais, sem cópias do DataFrame.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._quartiles = {}
+
+    @cached_property
+    def ranks(self):
+        return self.df.rank()
+
+    @cached_property
+    def pearson(self):
+        return self.df.corr(method="pearson")
+
+    @cached_property
+    def spearman(self):
+        # Spearman é o Pearson dos postos; com valores ausentes o pandas
+        # ranqueia par a par, então usa o cálculo dele
+        if self.df.isna().any().any():
+            return self.df.corr(method="spearman")
+        return self.ranks.corr(method="pearson")
+
+    def corr(self, method):
+        return self.pearson if method == "pearson" else self.spearman
+
+    def quartiles(self, target):
+        """Quartis de target (Q1..Q4); levanta ValueError se não houver quartis válidos."""
+        if target not in self._quartiles:
+            try:
+                self._quartiles[target] = pd.qcut(self.df[target], q=4, labels=["Q1","Q2","Q3","Q4"], duplicates="drop")
+            except ValueError as e:
+                self._quartiles[target] = e
+        group = self._quartiles[target]
+        if isinstance(group, ValueError):
+            raise group
+        return group
+
+    @cached_property
+    def stats(self):
+        stats = self.df.describe().transpose()[["mean","50%","std"]]
+        stats.rename(columns={"50%":"median"}, inplace=True)
+        stats["mode"] = self.df.mode().iloc[0]
+        return stats
+
 # ===== FUNÇÕES DE VISUALIZAÇÃO =====
-def save_heatmap(df, charts_dir, method="spearman"):
-    """Salva heatmap de correlação"""
-    corr = df.corr(method=method)
-    plt.figure(figsize=(9, 9))
-    sns.heatmap(corr, annot=True, cmap="coolwarm", fmt=".2f")
-    plt.title(f"Heatmap de Correlações ({method})")
-    fname = f"Heatmap_{method}.png"
-    plt.savefig(os.path.join(charts_dir, fname))
-    plt.close()
-
-
-def save_box(df, target, metric, charts_dir, rq_name):
-    """Salva histograma e boxplot de uma métrica em relação ao target."""
-    # Boxplot por quartis da variável independente
+# Cada função descreve o gráfico como um ChartJob; a renderização acontece de
+# uma vez, em paralelo, no final de run_analysis
+def heatmap_job(ctx, charts_dir, method="spearman"):
+    """Heatmap de correlação"""
+    corr = ctx.corr(method)
+    return ChartJob(
+        os.path.join(charts_dir, f"Heatmap_{method}.png"), "heatmap", library="sns",
+        kwargs={"data": corr, "annot": True, "cmap": "coolwarm", "fmt": ".2f"},
+        figsize=(9, 9), title=f"Heatmap de Correlações ({method})",
+    )
+
+
+def box_job(ctx, target, metric, charts_dir, rq_name):
+    """Boxplot de uma métrica por quartis da variável independente."""
     try:
-        df["group"] = pd.qcut(df[target], q=4, labels=["Q1","Q2","Q3","Q4"], duplicates="drop")
-        sns.boxplot(x="group", y=metric, data=df)
-        plt.xlabel(f"Quartis de {target}")
-        plt.ylabel(metric)
-        plt.title(f"Boxplot de {metric} por {target} ({rq_name})")
-        fname = f"Box_{rq_name}_{metric}.png"
-        plt.savefig(os.path.join(charts_dir, "boxplot", fname))
-        plt.close()
+        group = ctx.quartiles(target)
     except ValueError as e:
         print_and_write(content=f"[!] Não foi possível criar boxplot para {metric} vs {target} ({rq_name}): {e}\n")
+        return None
 
-    df.drop(columns=["group"], inplace=True, errors="ignore")
+    data = pd.DataFrame({"group": group, metric: ctx.df[metric]})
+    return ChartJob(
+        os.path.join(charts_dir, "boxplot", f"Box_{rq_name}_{metric}.png"), "boxplot", library="sns",
+        kwargs={"x": "group", "y": metric, "data": data},
+        title=f"Boxplot de {metric} por {target} ({rq_name})", xlabel=f"Quartis de {target}", ylabel=metric,
+    )
 
-def save_histogram(df, metric, charts_dir):
-    # Histograma
+def histogram_job(df, metric, charts_dir):
+    return ChartJob(
+        os.path.join(charts_dir, "histogram", f"Hist_{metric}.png"), "hist",
+        args=(df[metric].to_numpy(),), kwargs={"bins": 40, "color": "skyblue", "edgecolor": "black"},
+        title=f"Histograma de {metric}", xlabel=metric, ylabel="Frequência",
+    )
 
-    plt.hist(df[metric], bins=40, color="skyblue", edgecolor="black")
-    plt.xlabel(metric)
-    plt.ylabel("Frequência")
-    plt.title(f"Histograma de {metric}")
-    fname = f"Hist_{metric}.png"
-    plt.savefig(os.path.join(charts_dir, "histogram", fname))
-    plt.close()
 
-
-def save_scatter(df, target, metric, charts_dir, rq_name, xlabel=None, ylabel=None):
-    """Salva scatter plot entre target e metric."""
-
-    plt.scatter(df[target], df[metric], alpha=0.6)
-    plt.xlabel(xlabel if xlabel else target)
-    plt.ylabel(ylabel if ylabel else metric)
-    title = f"{rq_name}: {target} vs {metric}"
-    plt.title(title)
+def scatter_job(df, target, metric, charts_dir, rq_name, xlabel=None, ylabel=None):
+    """Scatter plot entre target e metric."""
     fname = f"Scatter_{rq_name}_{target}_vs_{metric}.png".replace(" ", "_")
-    plt.savefig(os.path.join(charts_dir, "scatter", fname))
-    plt.close()
+    return ChartJob(
+        os.path.join(charts_dir, "scatter", fname), "scatter",
+        args=(df[target].to_numpy(), df[metric].to_numpy()), kwargs={"alpha": 0.6},
+        title=f"{rq_name}: {target} vs {metric}",
+        xlabel=xlabel if xlabel else target, ylabel=ylabel if ylabel else metric,
+    )
 
 # ===== FUNÇÕES PARA RQS =====
-def analizar_rq01(df_final, charts_dir):
+def analizar_rq01(ctx, charts_dir):
     """RQ01 - Popularidade x Qualidade"""
     print_and_write(content="\n=== RQ01 ===\n")
 
     # Correlações
-    print_and_write(content=f"\nPearson:\n{df_final.corr(method='pearson')['stargazerCount']}\n")
-    print_and_write(content=f"\nSpearman:\n{df_final.corr(method='spearman')['stargazerCount']}\n")
+    print_and_write(content=f"\nPearson:\n{ctx.pearson['stargazerCount']}\n")
+    print_and_write(content=f"\nSpearman:\n{ctx.spearman['stargazerCount']}\n")
 
     # Gráficos
     metrics = ["loc", "cbo_mean", "dit_mean", "lcom_mean"]
+    jobs = []
     for metric in metrics:
-        save_scatter(df_final, "stargazerCount", metric, charts_dir, "RQ01",
-                     xlabel="Stars (popularidade)", ylabel=metric.upper())
-        save_box(df_final.copy(), "stargazerCount", metric, charts_dir, "RQ01")
+        jobs.append(scatter_job(ctx.df, "stargazerCount", metric, charts_dir, "RQ01",
+                                xlabel="Stars (popularidade)", ylabel=metric.upper()))
+        jobs.append(box_job(ctx, "stargazerCount", metric, charts_dir, "RQ01"))
+    return jobs
 
-def analizar_rq02(df_final, charts_dir):
+def analizar_rq02(ctx, charts_dir):
     """RQ02 - Maturidade x Qualidade"""
     print_and_write(content="\n=== RQ02 ===\n")
 
     # Correlações com maturidade (idade)
-    pearson_corr = df_final.corr(method="pearson")["age_years"]
-    spearman_corr = df_final.corr(method="spearman")["age_years"]
+    pearson_corr = ctx.pearson["age_years"]
+    spearman_corr = ctx.spearman["age_years"]
     print_and_write(content=f"\nPearson:\n{pearson_corr}\n")
     print_and_write(content=f"\nSpearman:\n{spearman_corr}\n")
 
     # Gráficos
     metrics = ["loc", "cbo_mean", "dit_mean", "lcom_mean"]
+    jobs = []
     for metric in metrics:
-        save_scatter(df_final, "age_years", metric, charts_dir, "RQ02",
-                     xlabel="Idade (anos)", ylabel=metric.upper())
-        save_box(df_final.copy(), "age_years", metric, charts_dir, "RQ02")
+        jobs.append(scatter_job(ctx.df, "age_years", metric, charts_dir, "RQ02",
+                                xlabel="Idade (anos)", ylabel=metric.upper()))
+        jobs.append(box_job(ctx, "age_years", metric, charts_dir, "RQ02"))
+    return jobs
 
-def analizar_rq03(df_final, charts_dir):
+def analizar_rq03(ctx, charts_dir):
     """RQ03 - Atividade x Qualidade"""
     print_and_write(content="\n=== RQ03 ===\n")
 
     # Correlações com atividade (número de releases)
-    pearson_corr = df_final.corr(method="pearson")["releases"]
-    spearman_corr = df_final.corr(method="spearman")["releases"]
+    pearson_corr = ctx.pearson["releases"]
+    spearman_corr = ctx.spearman["releases"]
     print_and_write(content=f"\nPearson:\n{pearson_corr}\n")
     print_and_write(content=f"\nSpearman:\n{spearman_corr}\n")
 
     # Gráficos
     metrics = ["loc", "cbo_mean", "dit_mean", "lcom_mean"]
+    jobs = []
     for metric in metrics:
-        save_scatter(df_final, "releases", metric, charts_dir, "RQ03",
-                     xlabel="Número de releases (atividade)", ylabel=metric.upper())
-        save_box(df_final.copy(), "releases", metric, charts_dir, "RQ03")
+        jobs.append(scatter_job(ctx.df, "releases", metric, charts_dir, "RQ03",
+                                xlabel="Número de releases (atividade)", ylabel=metric.upper()))
+        jobs.append(box_job(ctx, "releases", metric, charts_dir, "RQ03"))
+    return jobs
 
 
-def analizar_rq04(df_final, charts_dir):
+def analizar_rq04(ctx, charts_dir):
     """RQ04 - Tamanho x Qualidade"""
     print_and_write(content="\n=== RQ04 ===\n")
 
     # Correlações com tamanho (LOC)
-    pearson_corr = df_final.corr(method="pearson")["loc"]
-    spearman_corr = df_final.corr(method="spearman")["loc"]
+    pearson_corr = ctx.pearson["loc"]
+    spearman_corr = ctx.spearman["loc"]
     print_and_write(content=f"\nPearson:\n{pearson_corr}\n")
     print_and_write(content=f"\nSpearman:\n{spearman_corr}\n")
 
     # Gráficos
     metrics = ["cbo_mean", "dit_mean", "lcom_mean"]
+    jobs = []
     for metric in metrics:
-        save_scatter(df_final, "loc", metric, charts_dir, "RQ04",
-                     xlabel="LOC (tamanho)", ylabel=metric.upper())
-        save_box(df_final.copy(), "loc", metric, charts_dir, "RQ04")
+        jobs.append(scatter_job(ctx.df, "loc", metric, charts_dir, "RQ04",
+                                xlabel="LOC (tamanho)", ylabel=metric.upper()))
+        jobs.append(box_job(ctx, "loc", metric, charts_dir, "RQ04"))
+    return jobs
 
 
-def calc_stats(df_final, charts_dir):
-    save_heatmap(df_final, charts_dir, method="spearman")
-    save_heatmap(df_final, charts_dir, method="pearson")
+def calc_stats(ctx, charts_dir):
+    jobs = [
+        heatmap_job(ctx, charts_dir, method="spearman"),
+        heatmap_job(ctx, charts_dir, method="pearson"),
+    ]
 
     metrics = ["cbo_mean", "dit_mean", "lcom_mean", "loc"]
     for metric in metrics:
-        save_histogram(df_final.copy(), metric, charts_dir)
+        jobs.append(histogram_job(ctx.df, metric, charts_dir))
 
-    stats = df_final.describe().transpose()[["mean","50%","std"]]
-    stats.rename(columns={"50%":"median"}, inplace=True)
-    stats["mode"] = df_final.mode().iloc[0]
-    print_and_write(content=f"{stats}\n")
+    print_and_write(content=f"{ctx.stats}\n")
+    return jobs
 
 # ===== FUNÇÃO PRINCIPAL DO PIPELINE =====
 def run_analysis(original_csv=backup_original_csv):
@@ -225,13 +267,18 @@ def run_analysis(original_csv=backup_original_csv):
     os.makedirs(os.path.join(charts_dir, "boxplot"), exist_ok=True)
     os.makedirs(os.path.join(charts_dir, "scatter"), exist_ok=True)
 
-    numeric_df = df_final.select_dtypes(include='number')
+    # Correlações, quartis e estatísticas calculados uma vez para todas as RQs
+    ctx = AnalysisContext(df_final.select_dtypes(include='number'))
+
+    jobs = calc_stats(ctx, charts_dir)
+    jobs += analizar_rq01(ctx, charts_dir)
+    jobs += analizar_rq02(ctx, charts_dir)
+    jobs += analizar_rq03(ctx, charts_dir)
+    jobs += analizar_rq04(ctx, charts_dir)
 
-    calc_stats(numeric_df, charts_dir)
-    analizar_rq01(numeric_df, charts_dir)
-    analizar_rq02(numeric_df, charts_dir)
-    analizar_rq03(numeric_df, charts_dir)
-    analizar_rq04(numeric_df, charts_dir)
+    # Boxplots sem quartis válidos vêm como None
+    render_charts([job for job in jobs if job is not None])
+    print_and_write(content=f"[i] Gráficos salvos em {charts_dir}\n")
 
 def print_and_write(file_path=metrics_path, content=""):
     with open(file_path, "a") as f:
@@ -0,0 +1,191 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+
+class CKResultCache:
+    """
+    Cache em disco dos resultados do CK, endereçado pelo conteúdo analisado.
+
+    A chave é o SHA-256 de (repositório, SHA do commit analisado, versão do CK,
+    flags do CK): se o branch padrão não andou e o CK é o mesmo, o resultado
+    também é. Cada entrada é um diretório <cache_dir>/<chave[:2]>/<chave>/ com
+    os .csv gerados comprimidos (gzip).
+    Entradas gravadas há mais de `max_age` segundos são descartadas (a idade
+    conta da gravação, guardada em CREATED, e não do último uso) e, quando o
+    tamanho total ultrapassa `max_bytes`, as menos usadas recentemente são removidas.
+    """
+
+    STAMP = ".ck_key"
+    CREATED = ".created"
+
+    def __init__(self, cache_dir, max_age=30 * 24 * 3600, max_bytes=4 * 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, default_dir):
+        """
+        Configura o cache a partir de variáveis de ambiente (.env):
+        CK_CACHE=0 desativa, CK_CACHE_DIR, CK_CACHE_MAX_AGE_DAYS (0 = sem
+        expiração) e CK_CACHE_MAX_MB.
+        """
+        if os.getenv("CK_CACHE", "1") == "0":
+            return None
+        max_age_days = float(os.getenv("CK_CACHE_MAX_AGE_DAYS", "30"))
+        max_mb = float(os.getenv("CK_CACHE_MAX_MB", "4096"))
+        return cls(
+            os.getenv("CK_CACHE_DIR", default_dir),
+            max_age=max_age_days * 24 * 3600 if max_age_days > 0 else None,
+            max_bytes=int(max_mb * 1024 * 1024),
+        )
+
+    @staticmethod
+    def make_key(repo_name, head_sha, ck_version, flags):
+        canonical = json.dumps(
+            {"repo": repo_name, "sha": head_sha, "ck": ck_version, "flags": list(flags)},
+            sort_keys=True, separators=(",", ":"),
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _created(self, path):
+        # Entradas gravadas antes do CREATED usam o mtime do diretório
+        try:
+            with open(os.path.join(path, self.CREATED), encoding="utf-8") as f:
+                return float(f.read())
+        except (OSError, ValueError):
+            return os.path.getmtime(path)
+
+    def _expired(self, path, now=None):
+        if self.max_age is None:
+            return False
+        return (now or time.time()) - self._created(path) > self.max_age
+
+    @classmethod
+    def is_current(cls, key, output_dir):
+        """Indica se output_dir já contém o resultado correspondente à chave."""
+        try:
+            with open(os.path.join(output_dir, cls.STAMP), encoding="utf-8") as f:
+                return f.read().strip() == key
+        except OSError:
+            return False
+
+    def restore(self, key, output_dir):
+        """
+        Coloca em output_dir o resultado em cache. Retorna False se não houver
+        entrada válida para a chave.
+        """
+        path = self._path(key)
+        if not os.path.isdir(path) or self._expired(path):
+            return False
+
+        # Atualiza o mtime para que a remoção por tamanho siga a ordem LRU
+        # (a expiração usa a data de gravação, que não muda aqui)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        if self.is_current(key, output_dir):
+            return True
+
+        tmp_dir = f"{output_dir}.{threading.get_ident()}.tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        try:
+            for name in os.listdir(path):
+                if not name.endswith(".gz"):
+                    continue
+                with gzip.open(os.path.join(path, name), "rb") as src, \
+                        open(os.path.join(tmp_dir, name[:-3]), "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return False
+        self._write_stamp(key, tmp_dir)
+
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.replace(tmp_dir, output_dir)
+        return True
+
+    def store(self, key, output_dir):
+        """Guarda os .csv de output_dir no cache e marca o diretório com a chave."""
+        path = self._path(key)
+        tmp_dir = f"{path}.{threading.get_ident()}.tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+
+        for name in os.listdir(output_dir):
+            if not name.endswith(".csv"):
+                continue
+            with open(os.path.join(output_dir, name), "rb") as src, \
+                    gzip.open(os.path.join(tmp_dir, f"{name}.gz"), "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+        with open(os.path.join(tmp_dir, self.CREATED), "w", encoding="utf-8") as f:
+            f.write(repr(time.time()))
+
+        with self._lock:
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.replace(tmp_dir, path)
+            self._evict()
+        self._write_stamp(key, output_dir)
+
+    def _write_stamp(self, key, output_dir):
+        with open(os.path.join(output_dir, self.STAMP), "w", encoding="utf-8") as f:
+            f.write(key)
+
+    def _entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for prefix in os.listdir(self.cache_dir):
+            prefix_dir = os.path.join(self.cache_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, name)
+                if name.endswith(".tmp") or not os.path.isdir(path):
+                    continue
+                try:
+                    size = sum(e.stat().st_size for e in os.scandir(path))
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    continue
+                yield path, size, mtime
+
+    def _evict(self):
+        # Remove as entradas expiradas e, se ainda passar do limite, as menos
+        # usadas até ficar em 90% dele
+        now = time.time()
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for path, size, mtime in self._entries():
+            if self._expired(path, now):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                entries.append((path, size, mtime))
+
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        for path, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= target:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,154 @@
+import concurrent.futures
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from shared.quantile_sketch import KLLSketch
+
+# Colunas do class.csv usadas na consolidação, com tipos explícitos
+CK_CLASS_DTYPES = {"loc": "int64", "cbo": "float64", "dit": "float64", "lcom": "float64"}
+SUMMARY_COLUMNS = ["loc", "cbo_mean", "dit_mean", "lcom_mean"]
+MEDIAN_COLUMNS = [f"{col}_median" for col in CK_CLASS_DTYPES]
+INDEX_COLUMNS = ["nameWithOwner", "fingerprint", "classes", *SUMMARY_COLUMNS, *MEDIAN_COLUMNS]
+# Linhas do class.csv lidas por vez; limita a memória em monorepos com CSVs enormes
+CHUNK_ROWS = 100_000
+
+
+def class_csv_path(base_dir, repo_name):
+    return os.path.join(base_dir, repo_name.replace("/", "_"), "ck_output", "class.csv")
+
+
+def fingerprint(path):
+    """Identifica uma versão do arquivo por tamanho e mtime. None se não existir."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+class ClassMetricsAggregator:
+    """
+    Agregação em streaming das métricas de classe do CK.
+
+    Mantém somas e contagens por coluna (total de loc e médias de CBO, DIT e
+    LCOM) e um sketch de quantis por coluna, atualizados um bloco por vez.
+    Agregadores podem ser combinados com merge(), por exemplo para resumir
+    vários repositórios de uma vez.
+    """
+
+    def __init__(self, k=200):
+        self.classes = 0
+        self.sums = {col: 0 for col in CK_CLASS_DTYPES}
+        self.counts = {col: 0 for col in CK_CLASS_DTYPES}
+        self.sketches = {col: KLLSketch(k) for col in CK_CLASS_DTYPES}
+
+    def update(self, chunk):
+        self.classes += len(chunk)
+        for col in CK_CLASS_DTYPES:
+            values = chunk[col]
+            self.sums[col] += values.sum()
+            self.counts[col] += values.count()
+            self.sketches[col].update(values.to_numpy())
+
+    def merge(self, other):
+        self.classes += other.classes
+        for col in CK_CLASS_DTYPES:
+            self.sums[col] += other.sums[col]
+            self.counts[col] += other.counts[col]
+            self.sketches[col].merge(other.sketches[col])
+        return self
+
+    def percentile(self, col, q):
+        return self.sketches[col].quantile(q)
+
+    def summary(self):
+        if self.classes == 0:
+            return {"classes": 0}
+        summary = {
+            "classes": self.classes,
+            "loc": self.sums["loc"],
+            "cbo_mean": self.sums["cbo"] / self.counts["cbo"],
+            "dit_mean": self.sums["dit"] / self.counts["dit"],
+            "lcom_mean": self.sums["lcom"] / self.counts["lcom"],
+        }
+        for col in CK_CLASS_DTYPES:
+            summary[f"{col}_median"] = self.sketches[col].median()
+        return summary
+
+
+def aggregate_class_csv(path, chunksize=CHUNK_ROWS):
+    """Lê o class.csv em blocos, só com as colunas necessárias, e devolve o agregador."""
+    aggregator = ClassMetricsAggregator()
+    for chunk in pd.read_csv(path, usecols=list(CK_CLASS_DTYPES), dtype=CK_CLASS_DTYPES, chunksize=chunksize):
+        aggregator.update(chunk)
+    return aggregator
+
+
+def summarize_class_csv(path):
+    """Resumo de um repositório, com memória limitada a um bloco do class.csv."""
+    return aggregate_class_csv(path).summary()
+
+
+def load_index(index_path):
+    if not os.path.exists(index_path):
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    index = pd.read_csv(index_path, dtype={"nameWithOwner": "object", "fingerprint": "object"})
+    # Índice gravado com outras colunas: refaz do zero
+    if list(index.columns) != INDEX_COLUMNS:
+        return pd.DataFrame(columns=INDEX_COLUMNS)
+    return index
+
+
+def save_index(index, index_path):
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    tmp_path = f"{index_path}.tmp"
+    index.to_csv(tmp_path, index=False, columns=INDEX_COLUMNS)
+    os.replace(tmp_path, index_path)
+
+
+def update_ck_index(repo_names, base_dir, index_path, workers=None):
+    """
+    Atualiza o índice persistente de resumos do CK e retorna as linhas dos
+    repositórios pedidos (indexadas por nameWithOwner, na ordem de repo_names).
+
+    Cada linha guarda o fingerprint do class.csv de onde veio; só os
+    repositórios novos ou cujo class.csv mudou são lidos de novo, em paralelo
+    em um pool de processos. Repositórios sem class.csv ficam de fora.
+    """
+    repo_names = list(repo_names)
+    index = load_index(index_path)
+    rows = {row["nameWithOwner"]: row for row in index.to_dict("records")}
+
+    current = {repo: fingerprint(class_csv_path(base_dir, repo)) for repo in repo_names}
+    stale = [
+        repo for repo, fp in current.items()
+        if fp is not None and (repo not in rows or rows[repo]["fingerprint"] != fp)
+    ]
+    for repo, fp in current.items():
+        if fp is None:
+            rows.pop(repo, None)
+
+    if stale:
+        paths = [class_csv_path(base_dir, repo) for repo in stale]
+        workers = min(workers or os.cpu_count() or 1, len(stale))
+        if workers == 1:
+            summaries = map(summarize_class_csv, paths)
+            _merge_summaries(rows, stale, current, summaries)
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                summaries = executor.map(summarize_class_csv, paths, chunksize=max(1, len(paths) // (workers * 4)))
+                _merge_summaries(rows, stale, current, summaries)
+        save_index(pd.DataFrame(list(rows.values()), columns=INDEX_COLUMNS), index_path)
+    elif len(rows) != len(index):
+        save_index(pd.DataFrame(list(rows.values()), columns=INDEX_COLUMNS), index_path)
+
+    wanted = [repo for repo in repo_names if repo in rows]
+    return pd.DataFrame([rows[repo] for repo in wanted], columns=INDEX_COLUMNS).set_index("nameWithOwner")
+
+
+def _merge_summaries(rows, stale, current, summaries):
+    for repo, summary in zip(stale, summaries):
+        rows[repo] = {"nameWithOwner": repo, "fingerprint": current[repo], **summary}
@@ -1,93 +1,242 @@
 import pandas as pd
 
+import functools
+import hashlib
 import os
 import subprocess
 import sys
 import shutil
+import tarfile
 import time
 
-import zipfile
-
-def clone_zip_repo(repo_url, dest_dir):
+import requests
+
+from ck_cache import CKResultCache
+from ck_telemetry import CKTelemetry, run_measured, track
+
+# Arquivos extraídos do repositório: fontes Java, JARs (CK roda com useJars=true)
+# e os arquivos de build
+SOURCE_EXTENSIONS = (".java", ".jar")
+BUILD_FILES = {
+    "pom.xml", "build.gradle", "build.gradle.kts",
+    "settings.gradle", "settings.gradle.kts", "build.xml",
+}
+# Limites de extração (MB), configuráveis por variável de ambiente
+MAX_FILE_MB = float(os.getenv("CK_MAX_FILE_MB", "5"))
+MAX_REPO_MB = float(os.getenv("CK_MAX_REPO_MB", "2048"))
+
+
+def _is_wanted(path):
+    name = os.path.basename(path)
+    return name in BUILD_FILES or name.endswith(SOURCE_EXTENSIONS)
+
+
+def download_sources(repo_name, branch, dest_dir, max_file_mb=MAX_FILE_MB, max_repo_mb=MAX_REPO_MB, commit=None):
+    """
+    Baixa o tarball do branch (ou do commit, se informado) e extrai, em streaming, apenas fontes Java e
+    arquivos de build. O arquivo compactado nunca é gravado em disco: cada
+    entrada é lida direto da resposta HTTP e as demais são descartadas.
+    Arquivos maiores que max_file_mb são ignorados; se o total extraído
+    passar de max_repo_mb a extração é abortada.
+    Retorna (diretório extraído, bytes baixados, arquivos extraídos, segundos
+    gravando os arquivos extraídos em disco). O resto do tempo é rede e descompressão.
+    """
     if os.path.exists(dest_dir):
         shutil.rmtree(dest_dir)
     os.makedirs(dest_dir, exist_ok=True)
 
-    zip_path = os.path.join(dest_dir, "repo.zip")
-    result = os.system(f"curl -sS -L {repo_url} -o {zip_path}")
-    if result != 0:
-        raise Exception(f"Erro ao baixar o repositório {repo_url}")
-
-   
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(dest_dir)
-        root_folder = zip_ref.namelist()[0].split("/")[0]
-    
-    os.remove(zip_path)
-    return os.path.join(dest_dir, root_folder)
+    ref = commit or f"refs/heads/{branch}"
+    url = f"https://github.com/{repo_name}/archive/{ref}.tar.gz"
+    max_file_bytes = int(max_file_mb * 1024 * 1024)
+    max_repo_bytes = int(max_repo_mb * 1024 * 1024)
+    dest_root = os.path.realpath(dest_dir)
+    extracted_bytes = 0
+    extracted_files = 0
+    extract_seconds = 0.0
+
+    with requests.get(url, stream=True, timeout=(15, 300)) as response:
+        if response.status_code != 200:
+            raise Exception(f"Erro ao baixar o repositório {url}: status {response.status_code}")
+
+        with tarfile.open(fileobj=response.raw, mode="r|gz") as tar:
+            for member in tar:
+                if not member.isfile() or not _is_wanted(member.name):
+                    continue
+                if member.size > max_file_bytes:
+                    continue
+                extracted_bytes += member.size
+                if extracted_bytes > max_repo_bytes:
+                    raise Exception(f"Repositório {repo_name} excede o limite de {max_repo_mb} MB de fontes")
+
+                # Remove a pasta raiz "<repo>-<ref>/" e impede caminhos fora do destino
+                relative = member.name.split("/", 1)[-1]
+                target = os.path.realpath(os.path.join(dest_dir, relative))
+                if not target.startswith(dest_root + os.sep):
+                    continue
+
+                # Lê a entrada inteira (até max_file_mb) antes de gravar, para separar
+                # o tempo de rede/descompressão do tempo de disco
+                content = tar.extractfile(member).read()
+                started = time.perf_counter()
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target, "wb") as f:
+                    f.write(content)
+                extract_seconds += time.perf_counter() - started
+                extracted_files += 1
+
+        downloaded_bytes = response.raw.tell()
+
+    return dest_dir, downloaded_bytes, extracted_files, extract_seconds
 
 
 def delete_repo(repo_dir):
     if os.path.exists(repo_dir):
         shutil.rmtree(repo_dir)
 
-def run_ck(df):
+CK_JAR = os.path.join("ck", "target", "ck-0.7.1-SNAPSHOT-jar-with-dependencies.jar")
+# usar JARs, max files per partition = automático, extrair métricas de variáveis e campos
+CK_FLAGS = ['true', '0', 'true']
+
+# Cache dos resultados do CK por commit (CK_CACHE=0 desativa)
+ck_cache = CKResultCache.from_env(os.path.join(os.path.dirname(__file__), "..", "data", "cache", "ck"))
+# Logs JSON-lines com a telemetria de cada execução
+TELEMETRY_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "telemetry")
+
+
+def start_telemetry():
+    return CKTelemetry.for_run(TELEMETRY_DIR)
+
+
+def repo_base_dir(repo_name):
+    # Coloque o diretório base para clonar o repositório
     desktop_dir = os.path.join(os.path.expanduser("~"), "Desktop")
+    return os.path.join(desktop_dir, "ck_m", repo_name.replace("/", "_"))
+
+
+def output_dir_for(repo_name):
+    return os.path.join(repo_base_dir(repo_name), "ck_output")
+
+
+@functools.lru_cache(maxsize=None)
+def ck_version():
+    """Identifica o CK pelo hash do JAR (um SNAPSHOT recompilado muda a versão)."""
+    if not os.path.exists(CK_JAR):
+        return os.path.basename(CK_JAR)
+    digest = hashlib.sha256()
+    with open(CK_JAR, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def resolve_head_sha(repo_name, branch):
+    """Consulta o SHA atual do branch na API REST. Retorna None se falhar."""
+    headers = {"Accept": "application/vnd.github.sha"}
+    token = os.getenv("GITHUB_TOKEN")
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    try:
+        response = requests.get(f"https://api.github.com/repos/{repo_name}/commits/{branch}", headers=headers, timeout=15)
+    except requests.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.text.strip() or None
+
+
+def lookup_cached(repo_name, default_branch, head_sha=None, telemetry=None):
+    """
+    Procura o resultado do CK para o commit atual do branch.
+    Retorna (chave do cache, commit, acerto). Em um acerto o ck_output do
+    repositório já está pronto e download e análise podem ser pulados.
+    """
+    # Células vazias do CSV chegam como NaN (que é verdadeiro); só um SHA em texto vale
+    if not isinstance(head_sha, str) or not head_sha:
+        head_sha = None
+    if ck_cache is None:
+        return None, head_sha, False
+    with track(telemetry, repo_name, "cache") as stats:
+        if head_sha is None:
+            head_sha = resolve_head_sha(repo_name, default_branch)
+        if head_sha is None:
+            stats["hit"] = False
+            return None, None, False
+
+        key = ck_cache.make_key(repo_name, head_sha, ck_version(), CK_FLAGS)
+        hit = ck_cache.restore(key, output_dir_for(repo_name))
+        stats["hit"] = hit
+    return key, head_sha, hit
+
+
+def prepare_repo(repo_name, default_branch, head_sha=None, telemetry=None):
+    """Baixa as fontes do repositório. Retorna o diretório das fontes."""
+    base_dir = repo_base_dir(repo_name)
+    os.makedirs(base_dir, exist_ok=True)
+
+    # Baixa apenas as fontes necessárias ao CK, fixadas no commit quando conhecido
+    repo_dir = os.path.join(base_dir, "source")
+    with track(telemetry, repo_name, "download") as stats:
+        repo_dir, downloaded_bytes, extracted_files, extract_seconds = download_sources(
+            repo_name, default_branch, repo_dir, commit=head_sha)
+        stats["bytes_downloaded"] = downloaded_bytes
+        stats["files_extracted"] = extracted_files
+        stats["extract_seconds"] = round(extract_seconds, 4)
+    return repo_dir
+
+
+def analyze_repo(repo_name, repo_dir, cache_key=None, telemetry=None):
+    """
+    Executa o CK Tool sobre as fontes e remove as fontes ao final.
+    Com cache_key, o resultado é guardado no cache de resultados.
+    Retorna o diretório com os arquivos .csv gerados.
+    """
+    output_dir = output_dir_for(repo_name)
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    cmd = ['java', '-jar', CK_JAR, repo_dir, *CK_FLAGS, output_dir + os.sep]
+
+    try:
+        with track(telemetry, repo_name, "ck") as stats:
+            stats["peak_rss_mb"] = run_measured(cmd)
+    finally:
+        with track(telemetry, repo_name, "cleanup"):
+            time.sleep(0.5)
+            delete_repo(repo_dir)
+
+    if cache_key is not None:
+        with track(telemetry, repo_name, "cache_store"):
+            ck_cache.store(cache_key, output_dir)
+    return output_dir
 
+
+def run_ck(df):
+    telemetry = start_telemetry()
+    try:
+        _run_ck_rows(df, telemetry)
+    finally:
+        print(telemetry.summary())
+
+
+def _run_ck_rows(df, telemetry):
     for index, row in df.iterrows():
         repo_name = row['nameWithOwner']
         default_branch = row['defaultBranchRef']
-        # print(f"Processando repositório {repo_name} (branch: {default_branch})...")
-
-        # Coloque o diretório base para clonar o repositório
-        base_dir = os.path.join(desktop_dir, "ck_m", repo_name.replace("/", "_"))
-        os.makedirs(base_dir, exist_ok=True)
-
-        output_dir = os.path.join(base_dir, "ck_output")
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Clona o repositório
-        zip_url = f"https://github.com/{repo_name}/archive/refs/heads/{default_branch}.zip"
-        # print(f"[+] Clonando {zip_url} ...")
-        repo_dir = os.path.join(base_dir, "source")
-        try:
-            repo_dir = clone_zip_repo(zip_url, repo_dir)
 
+        cache_key, head_sha, hit = lookup_cached(repo_name, default_branch, row.get('headSha'), telemetry)
+        if hit:
+            print(f"[cache] {repo_name} sem mudanças desde a última análise")
+            continue
+
+        try:
+            repo_dir = prepare_repo(repo_name, default_branch, head_sha, telemetry)
         except Exception as e:
             print(f"Erro: {e}")
             continue
 
-        """
-        Executa o CK Tool e retorna os caminhos para os arquivos .csv gerados.
-        """
-        if os.path.exists(output_dir):
-            shutil.rmtree(output_dir)
-        os.makedirs(output_dir)
-
-        # print(f"[+] Executando CK Tool nas fontes em {repo_dir} ...")
-
-        jar_path = os.path.join("ck", "target", "ck-0.7.1-SNAPSHOT-jar-with-dependencies.jar")
-        
-        cmd = [
-            'java', '-jar', jar_path,
-            repo_dir,
-            'true',      # usar JARs
-            '0',         # max files per partition = automático
-            'true',      # extrair métricas de variáveis e campos
-            output_dir + os.sep
-        ]
-
         try:
-            subprocess.run(cmd, check=True)
+            analyze_repo(repo_name, repo_dir, cache_key, telemetry)
         except subprocess.CalledProcessError as e:
             print("Erro ao executar o CK:", e)
-            # print("STDOUT:", e.stdout)
-            # print("STDERR:", e.stderr)
             continue
-        
-        time.sleep(0.5) 
-        delete_repo(repo_dir) 
-
-        # print(f"[OK] Métricas salvas em {output_dir}")
-        
-
@@ -0,0 +1,87 @@
+import queue
+import subprocess
+import threading
+
+from ck_metrics_extractor import lookup_cached, prepare_repo, analyze_repo, start_telemetry
+
+# Marca de fim de fila para os workers
+_DONE = None
+
+
+def order_by_size(df):
+    """
+    Ordena os repositórios do maior para o menor (diskUsage, em KB), para que
+    os mais demorados comecem primeiro e não fiquem sozinhos no fim da fila.
+    CSVs antigos sem a coluna mantêm a ordem original.
+    """
+    if "diskUsage" not in df.columns:
+        return df
+    return df.sort_values("diskUsage", ascending=False, kind="stable")
+
+
+def run_ck_pipeline(df, download_workers=4, ck_workers=5, prefetch=None):
+    """
+    Roda o CK em um pipeline de estágios ligados por filas:
+
+    download/extração (I/O de rede) -> fila limitada -> CK (CPU) -> limpeza
+
+    Cada estágio tem seu próprio pool de threads, e os repositórios são
+    distribuídos dinamicamente: um worker livre pega o próximo da fila em vez
+    de receber uma fatia fixa do DataFrame. A fila entre os estágios guarda
+    até `prefetch` repositórios já baixados, de modo que o download do próximo
+    acontece enquanto o CK analisa o atual, sem encher o disco.
+    """
+    prefetch = prefetch or ck_workers
+    telemetry = start_telemetry()
+
+    pending = queue.Queue()
+    ready = queue.Queue(maxsize=prefetch)
+
+    for _, row in order_by_size(df).iterrows():
+        pending.put((row['nameWithOwner'], row['defaultBranchRef'], row.get('headSha')))
+
+    def download_worker():
+        while True:
+            try:
+                repo_name, default_branch, head_sha = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                cache_key, head_sha, hit = lookup_cached(repo_name, default_branch, head_sha, telemetry)
+                if hit:
+                    # Commit já analisado com o mesmo CK: nada a baixar nem analisar
+                    print(f"[cache] {repo_name} sem mudanças desde a última análise")
+                    continue
+                repo_dir = prepare_repo(repo_name, default_branch, head_sha, telemetry)
+            except Exception as e:
+                print(f"Erro: {e}")
+                continue
+            ready.put((repo_name, repo_dir, cache_key))
+
+    def ck_worker():
+        while True:
+            item = ready.get()
+            if item is _DONE:
+                return
+            repo_name, repo_dir, cache_key = item
+            try:
+                analyze_repo(repo_name, repo_dir, cache_key, telemetry)
+            except subprocess.CalledProcessError as e:
+                print("Erro ao executar o CK:", e)
+            except Exception as e:
+                print(f"Erro: {e}")
+
+    downloaders = [threading.Thread(target=download_worker, daemon=True) for _ in range(download_workers)]
+    analyzers = [threading.Thread(target=ck_worker, daemon=True) for _ in range(ck_workers)]
+    for t in downloaders + analyzers:
+        t.start()
+
+    for t in downloaders:
+        t.join()
+    for _ in analyzers:
+        ready.put(_DONE)
+    for t in analyzers:
+        t.join()
+
+    # Onde o tempo foi gasto: download, CK, limpeza...
+    print(telemetry.summary())
@@ -0,0 +1,125 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Estágios na ordem em que aparecem no resumo
+STAGES = ["cache", "download", "ck", "cleanup", "cache_store"]
+
+
+class CKTelemetry:
+    """
+    Telemetria por repositório e por estágio da extração do CK.
+
+    Cada estágio concluído vira um evento JSON (uma linha) no log da execução,
+    com duração, status e os números do estágio (bytes baixados, arquivos
+    extraídos, tempo gravando a extração em disco, pico de memória do Java...). Ao final, summary() monta uma
+    tabela com os totais por estágio, para ver onde o tempo está sendo gasto.
+    """
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.started = time.perf_counter()
+        self._events = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+
+    @classmethod
+    def for_run(cls, log_dir):
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return cls(os.path.join(log_dir, f"ck_run_{stamp}.jsonl"))
+
+    def record(self, repo, stage, seconds, status="ok", **fields):
+        event = {"ts": time.time(), "repo": repo, "stage": stage, "seconds": round(seconds, 4), "status": status, **fields}
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            self._events.append(event)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def summary(self):
+        with self._lock:
+            events = list(self._events)
+        wall = time.perf_counter() - self.started
+
+        header = f"{'estágio':<12} {'repos':>6} {'erros':>6} {'total(s)':>10} {'média(s)':>9} {'máx(s)':>8} {'% tempo':>8}  extras"
+        lines = [header, "-" * len(header)]
+        busy = sum(e["seconds"] for e in events) or 1.0
+        for stage in STAGES + sorted({e["stage"] for e in events} - set(STAGES)):
+            stage_events = [e for e in events if e["stage"] == stage]
+            if not stage_events:
+                continue
+            total = sum(e["seconds"] for e in stage_events)
+            errors = sum(1 for e in stage_events if e["status"] != "ok")
+            lines.append(
+                f"{stage:<12} {len(stage_events):>6} {errors:>6} {total:>10.1f} {total / len(stage_events):>9.2f} "
+                f"{max(e['seconds'] for e in stage_events):>8.2f} {100 * total / busy:>7.1f}%  {_extras(stage_events)}"
+            )
+        lines.append(f"Tempo total da execução: {wall:.1f}s  |  log: {self.log_path}")
+        return "\n".join(lines)
+
+
+def _extras(events):
+    parts = []
+    downloaded = sum(e.get("bytes_downloaded", 0) for e in events)
+    if downloaded:
+        parts.append(f"{downloaded / 1024 / 1024:.1f} MB baixados")
+    files = sum(e.get("files_extracted", 0) for e in events)
+    if files:
+        parts.append(f"{files} arquivos")
+    extract = sum(e.get("extract_seconds", 0) for e in events)
+    if extract:
+        # O restante do estágio de download é rede e descompressão
+        total = sum(e["seconds"] for e in events) or 1.0
+        parts.append(f"extração em disco {extract:.1f}s ({100 * extract / total:.0f}%)")
+    hits = sum(1 for e in events if e.get("hit"))
+    if events[0]["stage"] == "cache":
+        parts.append(f"{hits} acertos")
+    rss = [e["peak_rss_mb"] for e in events if e.get("peak_rss_mb") is not None]
+    if rss:
+        parts.append(f"pico RSS máx {max(rss):.0f} MB")
+    return ", ".join(parts)
+
+
+@contextmanager
+def track(telemetry, repo, stage):
+    """
+    Mede um estágio. O dicionário entregue ao bloco recebe os números do
+    estágio, que vão para o evento. Sem telemetria, apenas executa o bloco.
+    """
+    fields = {}
+    started = time.perf_counter()
+    try:
+        yield fields
+    except Exception as e:
+        if telemetry is not None:
+            telemetry.record(repo, stage, time.perf_counter() - started, status="error", error=str(e)[:300], **fields)
+        raise
+    if telemetry is not None:
+        telemetry.record(repo, stage, time.perf_counter() - started, **fields)
+
+
+def run_measured(cmd):
+    """
+    Executa cmd como subprocess.run(cmd, check=True) e retorna o pico de
+    memória (RSS, em MB) do processo filho, ou None onde não há os.wait4.
+    """
+    proc = subprocess.Popen(cmd)
+    if not hasattr(os, "wait4"):
+        returncode = proc.wait()
+        peak_rss_mb = None
+    else:
+        _, status, usage = os.wait4(proc.pid, 0)
+        returncode = os.waitstatus_to_exitcode(status)
+        proc.returncode = returncode
+        # ru_maxrss vem em KB no Linux e em bytes no macOS
+        divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+        peak_rss_mb = usage.ru_maxrss / divisor
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+    return peak_rss_mb
+
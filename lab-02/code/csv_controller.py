@@ -1,27 +1,76 @@
 import csv
 import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from shared.columnar_store import DATETIME
 
 data_dir = os.path.join(os.path.dirname(__file__), "../data/raw_repos")
 
+# Tipos das colunas, usados para a leitura tipada/colunar na análise
+SCHEMA = {
+    "nameWithOwner": "object",
+    "createdAt": DATETIME,
+    "releases": "int64",
+    "stargazerCount": "int64",
+    "defaultBranchRef": "object",
+}
+
+HEADER = [
+    "nameWithOwner", "createdAt", "releases",
+    "stargazerCount", "defaultBranchRef", "diskUsage", "headSha"
+]
+
+
+def repository_row(repo):
+    return [
+        repo['nameWithOwner'],
+        repo['createdAt'],
+        repo['releases']['totalCount'],
+        repo['stargazerCount'],
+        repo['defaultBranchRef']['name'] if repo['defaultBranchRef'] else 'main',
+        repo.get('diskUsage') or 0,
+        (repo['defaultBranchRef'].get('target') or {}).get('oid', '') if repo['defaultBranchRef'] else ''
+    ]
+
+
 def save_to_csv(repositories):
-    # Salva no diretório ../data
+    # Salva no diretório ../data/raw_repos
     os.makedirs(data_dir, exist_ok=True)
     file_path = os.path.join(data_dir, f"resultados{len(repositories)}Repos.csv")
 
     with open(file_path, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
-        writer.writerow([
-            "nameWithOwner", "createdAt", "releases",
-            "stargazerCount", "defaultBranchRef"
-        ])
-        for repo in repositories:
-            writer.writerow([
-                repo['nameWithOwner'],
-                repo['createdAt'],
-                repo['releases']['totalCount'],
-                repo['stargazerCount'],
-                repo['defaultBranchRef']['name'] if repo['defaultBranchRef'] else 'main'
-            ])
+        writer.writerow(HEADER)
+        writer.writerows(repository_row(repo) for repo in repositories)
+    return file_path
+
+
+def stream_to_csv(pages, total_repos):
+    """
+    Grava as páginas no CSV conforme são geradas, mantendo em memória apenas
+    a página atual. O arquivo é descarregado a cada página, então pode ser
+    lido enquanto a coleta ainda está em andamento. Se vierem menos
+    repositórios que o pedido, o arquivo é renomeado para a quantidade real.
+    Retorna (caminho do arquivo, quantidade gravada).
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    file_path = os.path.join(data_dir, f"resultados{total_repos}Repos.csv")
+
+    count = 0
+    with open(file_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for page in pages:
+            writer.writerows(repository_row(repo) for repo in page)
+            count += len(page)
+            f.flush()
+
+    if count != total_repos:
+        final_path = os.path.join(data_dir, f"resultados{count}Repos.csv")
+        os.replace(file_path, final_path)
+        file_path = final_path
+    return file_path, count
 
 def list_saved_results():
     files = os.listdir(data_dir)
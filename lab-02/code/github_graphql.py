@@ -1,14 +1,22 @@
 import os
+import sys
 import time
 
-import requests
 from dotenv import load_dotenv
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from shared.checkpoint import CursorCheckpoint
+from shared.github_client import GraphQLClient
+from shared.response_cache import ResponseCache
+
 # Carrega variáveis do .env
 load_dotenv()
 GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 
-if not GITHUB_TOKEN:
+# Cache em disco das respostas (GITHUB_OFFLINE=1 usa apenas o cache)
+cache = ResponseCache.from_env(os.path.join(os.path.dirname(__file__), "..", "data", "cache", "graphql"))
+
+if not GITHUB_TOKEN and not (cache and cache.offline):
     raise Exception("Erro: GITHUB_TOKEN não encontrado no arquivo .env")
 
 query = """
@@ -18,9 +26,10 @@ query find($pageSize: Int!, $afterCursor: String) {
       ... on Repository {
         createdAt
         releases { totalCount }
-        defaultBranchRef { name }
+        defaultBranchRef { name target { oid } }
         nameWithOwner
         stargazerCount
+        diskUsage
       }
     }
     pageInfo {
@@ -31,68 +40,60 @@ query find($pageSize: Int!, $afterCursor: String) {
 }
 """
 
-headers = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
+# Sessão HTTP compartilhada (keep-alive, gzip e retry centralizado)
+client = GraphQLClient(GITHUB_TOKEN, timeout=15, backoff=3, cache=cache)
 
 
-def fetch_repositories(total_repos=100):
-    results = []
-    page_size = 20
+checkpoint_dir = os.path.join(os.path.dirname(__file__), "..", "data", "checkpoints")
+
+
+def iter_repository_pages(total_repos=100, resume=True):
+    """
+    Gera as páginas de repositórios à medida que chegam da API, sem acumular
+    a coleta em memória. Cada página é confirmada em um checkpoint em disco;
+    com resume=True uma coleta interrompida reemite as páginas já confirmadas
+    e continua a partir do último cursor.
+    """
+    checkpoint = CursorCheckpoint(os.path.join(checkpoint_dir, f"fetch_repositories_{total_repos}.jsonl"))
+    if not resume:
+        checkpoint.clear()
+
+    emitted = 0
     after_cursor = None
+    has_next = True
+    for nodes, after_cursor, has_next in checkpoint.iter_pages():
+        nodes = nodes[:total_repos - emitted]
+        emitted += len(nodes)
+        yield nodes
+    if emitted:
+        print(f"[i] Retomando coleta a partir do checkpoint ({emitted} repositórios já coletados)")
 
-    while len(results) < total_repos:
+    page_size = 20
+    while has_next and emitted < total_repos:
         variables = {
             "pageSize": page_size,
             "afterCursor": after_cursor
         }
-
-        # Tentativa com retry automático
-        for tentativa in range(3):
-            try:
-                response = requests.post(
-                    "https://api.github.com/graphql",
-                    json={"query": query, "variables": variables},
-                    headers=headers,
-                    timeout=15  # evita travar indefinidamente
-                )
-
-                if response.status_code == 200:
-                    break
-                else:
-                    print(f"[AVISO] Falha {response.status_code}, tentativa {tentativa+1}/3")
-                    print(f"[DEBUG] Conteúdo da resposta: {response.text}")
-                    time.sleep(3)
-
-            except requests.exceptions.RequestException as e:
-                print(f"[ERRO] Problema de conexão: {e}, tentativa {tentativa+1}/3")
-                time.sleep(3)
-        else:
-            print(f"[ERRO] Query falhou após 3 tentativas. Última resposta:")
-            print(f"Status: {response.status_code}")
-            print(f"Headers: {response.headers}")
-            print(f"Body: {response.text}")
-            raise Exception(f"Query falhou após 3 tentativas: {response.status_code}, {response.text}")
-
-        try:
-            data = response.json().get("data", {}).get("search", None)
-        except Exception as e:
-            print(f"[ERRO] Falha ao decodificar JSON da resposta: {e}")
-            print(f"Resposta bruta: {response.text}")
-            raise
+        data = client.execute(query, variables).get("search")
         if not data:
-            print(f"[ERRO] Resposta inesperada da API:")
-            print(f"Status: {response.status_code}")
-            print(f"Headers: {response.headers}")
-            print(f"Body: {response.text}")
-            raise Exception(f"Resposta inesperada da API: {response.text}")
+            raise Exception("Resposta inesperada da API: campo 'search' ausente")
+
+        after_cursor = data["pageInfo"]["endCursor"]
+        has_next = data["pageInfo"]["hasNextPage"]
+        checkpoint.commit(data["nodes"], after_cursor, has_next)
 
-        results.extend(data["nodes"])
+        nodes = data["nodes"][:total_repos - emitted]
+        emitted += len(nodes)
+        yield nodes
 
-        if not data["pageInfo"]["hasNextPage"]:
-            break
+        if has_next and not client.last_cached:
+            time.sleep(1)  # evita sobrecarregar a API
 
-        after_cursor = data["pageInfo"]["endCursor"]
-        remaining = total_repos - len(results)
+    checkpoint.clear()
 
-        time.sleep(1)  # evita sobrecarregar a API
 
-    return results[:total_repos]
+def fetch_repositories(total_repos=100, resume=True):
+    results = []
+    for page in iter_repository_pages(total_repos, resume=resume):
+        results.extend(page)
+    return results
@@ -1,11 +1,9 @@
 import pandas as pd
 import os
-import concurrent.futures
-import math
 
-from github_graphql import fetch_repositories
-from csv_controller import (save_to_csv, list_saved_results)
-from ck_metrics_extractor import run_ck
+from github_graphql import iter_repository_pages
+from csv_controller import (stream_to_csv, list_saved_results)
+from ck_pipeline import run_ck_pipeline
 from analyze import run_analysis
 
 def print_main_menu():
@@ -57,10 +55,9 @@ if __name__ == '__main__':
                     exit()
 
                 print(f"Buscando dados dos {n_repos} repositórios Java mais populares...")
-                repositorios = fetch_repositories(n_repos)
-               
-                save_to_csv(repositorios)
-                print(f"Dados salvos em ../data/raw_repos/resultados{n_repos}Repos.csv")
+                # Cada página é gravada no CSV assim que chega
+                file_path, _ = stream_to_csv(iter_repository_pages(n_repos), n_repos)
+                print(f"Dados salvos em {file_path}")
 
             elif(option == "2"):
                 data_path = choose_repos()
@@ -68,26 +65,9 @@ if __name__ == '__main__':
                     continue
                 df = pd.read_csv(data_path)
                 print(f"Rodando CK no arquivo {data_path}...")
-                max_threads = 5
+                # Download e CK em estágios separados, maiores repositórios primeiro
+                run_ck_pipeline(df)
 
-                def split_df(df, n_chunks):
-                    chunk_size = math.ceil(len(df) / n_chunks)
-                    return [df.iloc[i*chunk_size:(i+1)*chunk_size] for i in range(n_chunks)]
-
-                df_chunks = split_df(df, max_threads)
-
-                # Função wrapper para rodar cada chunk
-                def process_chunk(chunk):
-                    run_ck(chunk)
-
-                with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
-                    futures = [executor.submit(process_chunk, chunk) for chunk in df_chunks]
-                    for future in concurrent.futures.as_completed(futures):
-                        try:
-                            future.result()  # lança exceções se houver
-                        except Exception as e:
-                            print(f"[ERRO] Um chunk falhou: {e}")
-            
             elif(option == "3"):
                 data_path = choose_repos()
                 if not data_path:
@@ -1,10 +1,18 @@
+import concurrent.futures
 import os
+import sys
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import seaborn as sns
-from scipy import stats
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from shared.chart_farm import ChartJob, render_charts
+from shared.columnar_store import load_table
+from shared.partitioned_store import PartitionedStore
+from shared.quantile_sketch import KLLSketch, default_rank_error
+
+from pr_store import PRS_SCHEMA, open_pr_store
+from rank_stats import RankStats
 
 # ---------------- Paths ----------------
 DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
@@ -17,13 +25,29 @@ NUM_METRICS = [
     "analysis_hours","desc_len_chars",
     "interactions_participants","interactions_comments"
 ]
+# Métricas cortadas nos quantis 2%/98%, nesta ordem
+OUTLIER_COLUMNS = NUM_METRICS + ["reviews_count"]
+# Colunas ranqueadas pelo kernel de estatísticas (métricas + alvos das RQs)
+RANKED_COLUMNS = NUM_METRICS + ["reviews_count", "final_status_bin"]
+# Reamostragens do bootstrap dos ICs do Spearman (0 = sem IC; ver SPEARMAN_BOOTSTRAP_SAMPLES)
+BOOTSTRAP_SAMPLES_ENV = "SPEARMAN_BOOTSTRAP_SAMPLES"
 
 # ---------------- Utility functions ----------------
 
-def _load_dataset(path: str = None) -> pd.DataFrame:
+def _load_dataset(path: str = None, columns=None, repos=None) -> pd.DataFrame:
+    """
+    Carrega o dataset de PRs. Sem `path`, lê do armazenamento particionado
+    (só as partições de `repos`, se informado); sem partições gravadas, usa
+    o CSV consolidado antigo.
+    """
     if path is None:
+        store = open_pr_store()
+        if len(store):
+            return store.read(keys=repos, columns=columns)
         path = os.path.join(PROC_DIR, "dataset_prs.csv")
-    df = pd.read_csv(path, parse_dates=["createdAt","endTime"])
+    df = load_table(path, PRS_SCHEMA, columns=columns)
+    if repos is not None:
+        df = df[df["repo"].isin(repos)] if "repo" in df.columns else df
     return df
 
 def _ensure_dirs():
@@ -43,147 +67,144 @@ def _write(msg: str, header=False):
             f.write(msg + "\n")
     print(msg)
 
+def _within(df: pd.DataFrame, thresholds: dict) -> pd.Series:
+    """Linhas dentro de todos os limites (mínimo, máximo) já calculados"""
+    mask = pd.Series(True, index=df.index)
+    for col, (q_low, q_hi) in thresholds.items():
+        mask &= (df[col] >= q_low) & (df[col] <= q_hi)
+    return mask
+
 def _clean_outliers(df: pd.DataFrame, lower_q=0.02, upper_q=0.98) -> pd.DataFrame:
     """Remove outliers com base em quantis (menos agressivo que o IQR)"""
-    for col in NUM_METRICS + ["reviews_count"]:
+    for col in OUTLIER_COLUMNS:
         if col in df.columns:
             q_low = df[col].quantile(lower_q)
             q_hi = df[col].quantile(upper_q)
             df = df[(df[col] >= q_low) & (df[col] <= q_hi)]
     return df
 
-def _spearman_series(df: pd.DataFrame, y: str) -> pd.DataFrame:
-    """Correlação de Spearman entre cada métrica e a variável y"""
-    rows = []
-    for x in NUM_METRICS:
-        s = df[[x, y]].dropna()
-        if len(s) < 5:
-            continue
-        rho, p = stats.spearmanr(s[x], s[y])
-        rows.append({
-            "metric": x,
-            "rho": rho,
-            "p": p,
-            "significant": "YES" if p < 0.05 else "NO"
-        })
-    return pd.DataFrame(rows).sort_values("rho", ascending=False)
-
-def charts_basic(df: pd.DataFrame):
-    """Gera gráficos exploratórios básicos"""
+def _partition_sketches(store: PartitionedStore, key: str, rank_error: float) -> dict:
+    """Um KLLSketch por métrica de corte, montado a partir de uma partição"""
+    part = store.read_partition(key, OUTLIER_COLUMNS)
+    sketches = {col: KLLSketch.for_error(rank_error) for col in OUTLIER_COLUMNS}
+    for col, sketch in sketches.items():
+        sketch.update(part[col].to_numpy())
+    return sketches
+
+def _streaming_thresholds(store: PartitionedStore, rank_error: float, lower_q=0.02, upper_q=0.98,
+                          workers: int = None) -> dict:
+    """
+    Limites de corte de cada métrica em uma única passada pelas partições do
+    armazenamento: cada partição vira um KLLSketch por coluna (em paralelo) e
+    os sketches são combinados. Em memória ficam só a partição sendo lida por
+    worker e os sketches, com erro de posição `rank_error`. Diferente do corte
+    sequencial em memória, os quantis de cada coluna usam todos os PRs.
+    """
+    merged = {col: KLLSketch.for_error(rank_error) for col in OUTLIER_COLUMNS}
+    workers = workers or min(8, os.cpu_count() or 1)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for sketches in executor.map(lambda key: _partition_sketches(store, key, rank_error), store.select()):
+            for col, sketch in sketches.items():
+                merged[col].merge(sketch)
+    return {col: tuple(sketch.quantiles([lower_q, upper_q])) for col, sketch in merged.items()}
+
+def _rank_stats(df: pd.DataFrame) -> RankStats:
+    """Postos de todas as métricas, calculados uma vez e usados por todas as análises"""
+    return RankStats(df, RANKED_COLUMNS)
+
+def _bootstrap_samples() -> int:
+    return int(os.getenv(BOOTSTRAP_SAMPLES_ENV) or 0)
+
+def _spearman_series(kernel: RankStats, y: str) -> pd.DataFrame:
+    """Correlação de Spearman entre cada métrica e a variável y (com IC por bootstrap, se ativado)"""
+    s = kernel.spearman(y, NUM_METRICS)
+    columns = ["metric", "rho", "p", "significant"]
+    samples = _bootstrap_samples()
+    if samples > 0:
+        s = s.merge(kernel.bootstrap_spearman(y, list(s["metric"]), samples=samples), on="metric")
+        columns = ["metric", "rho", "ci_low", "ci_high", "p", "significant"]
+    s["significant"] = np.where(s["p"] < 0.05, "YES", "NO")
+    return s[columns].sort_values("rho", ascending=False)
+
+def charts_basic(df: pd.DataFrame, kernel: RankStats):
+    """Gera gráficos exploratórios básicos (renderizados em paralelo)"""
     _ensure_dirs()
+    jobs = []
 
     # Histograms
     for m in NUM_METRICS + ["reviews_count"]:
-        plt.figure(figsize=(7,4))
-        plt.hist(df[m].dropna(), bins=40)
-        plt.title(f"Histogram - {m}")
-        plt.xlabel(m); plt.ylabel("Frequency")
-        plt.tight_layout()
-        plt.savefig(os.path.join(CHARTS_DIR, "hist", f"hist_{m}.png"))
-        plt.close()
+        jobs.append(ChartJob(
+            os.path.join(CHARTS_DIR, "hist", f"hist_{m}.png"), "hist",
+            args=(df[m].dropna().to_numpy(),), kwargs={"bins": 40},
+            figsize=(7,4), title=f"Histogram - {m}", xlabel=m, ylabel="Frequency", tight_layout=True,
+        ))
 
     # Heatmap de correlações
-    corr_spear = df[NUM_METRICS + ["reviews_count","final_status_bin"]].corr(method="spearman")
-    plt.figure(figsize=(8,7))
-    sns.heatmap(corr_spear, annot=True, fmt=".2f", cmap="coolwarm")
-    plt.title("Spearman Correlations")
-    plt.tight_layout()
-    plt.savefig(os.path.join(CHARTS_DIR, "corr", "heatmap_spearman.png"))
-    plt.close()
-
-    # Boxplots por status
-    for m in NUM_METRICS:
-        plt.figure(figsize=(6,4))
-        sns.boxplot(x="final_status_bin", y=m, data=df, showfliers=False)
-        plt.title(f"{m} by PR status")
-        plt.tight_layout()
-        plt.savefig(os.path.join(CHARTS_DIR, "box", "status", f"box_{m}_by_status.png"))
-        plt.close()
-
-        sns.violinplot(x="final_status_bin", y=m, data=df, cut=0, inner="quartile") 
-        plt.tight_layout()
-        plt.savefig(os.path.join(CHARTS_DIR, "violin", "status", f"violin_{m}_by_status.png")) 
-        plt.close()
-
-    # Boxplots por revisões
-    for m in NUM_METRICS:
-        plt.figure(figsize=(6,4))
-        sns.boxplot(x="reviews_count", y=m, data=df, showfliers=False)
-        plt.title(f"{m} by PR status")
-        plt.tight_layout()
-        plt.savefig(os.path.join(CHARTS_DIR, "box", "reviews", f"box_{m}_by_reviews.png"))
-        plt.close()
-
-        sns.violinplot(x="reviews_count", y=m, data=df, cut=0, inner="quartile") 
-        plt.tight_layout() 
-        plt.savefig(os.path.join(CHARTS_DIR, "violin", "reviews", f"violin_{m}_by_reviews.png")) 
-        plt.close()
+    corr_spear = kernel.corr
+    jobs.append(ChartJob(
+        os.path.join(CHARTS_DIR, "corr", "heatmap_spearman.png"), "heatmap", library="sns",
+        kwargs={"data": corr_spear, "annot": True, "fmt": ".2f", "cmap": "coolwarm"},
+        figsize=(8,7), title="Spearman Correlations", tight_layout=True,
+    ))
+
+    # Boxplots e violinos por status e por revisões
+    for group, sub in [("final_status_bin", "status"), ("reviews_count", "reviews")]:
+        for m in NUM_METRICS:
+            data = df[[group, m]]
+            jobs.append(ChartJob(
+                os.path.join(CHARTS_DIR, "box", sub, f"box_{m}_by_{sub}.png"), "boxplot", library="sns",
+                kwargs={"x": group, "y": m, "data": data, "showfliers": False},
+                figsize=(6,4), title=f"{m} by PR status", tight_layout=True,
+            ))
+            jobs.append(ChartJob(
+                os.path.join(CHARTS_DIR, "violin", sub, f"violin_{m}_by_{sub}.png"), "violinplot", library="sns",
+                kwargs={"x": group, "y": m, "data": data, "cut": 0, "inner": "quartile"},
+                tight_layout=True,
+            ))
 
     # Scatter com número de revisões
     for m in NUM_METRICS:
-        plt.figure(figsize=(6,4))
-        plt.scatter(df[m], df["reviews_count"], alpha=0.5)
-        plt.xlabel(m); plt.ylabel("reviews_count")
-        plt.title(f"{m} vs reviews_count")
-        plt.tight_layout()
-        plt.savefig(os.path.join(CHARTS_DIR, "scatter", f"scatter_{m}_vs_reviews.png"))
-        plt.close()
-
-    # Barras médias por status
-    for m in NUM_METRICS:
-        plt.figure(figsize=(6,4))
-        mean = df.groupby("final_status_bin")[m].mean().reset_index()
-        sns.barplot(x="final_status_bin", y=m, data=mean, palette="viridis")
-        plt.title(f"Mean {m} by PR status")
-        plt.tight_layout()
-        plt.savefig(os.path.join(CHARTS_DIR, "bar", "status", f"bar_mean_{m}_by_status.png"))
-        plt.close()
-
-    # Barras por revisões
-    for m in NUM_METRICS:
-        plt.figure(figsize=(6,4))
-        mean = df.groupby("reviews_count")[m].mean().reset_index()
-        sns.barplot(x="reviews_count", y=m, data=mean, palette="viridis")
-        plt.title(f"Mean {m} by reviews_count")
-        plt.tight_layout()
-        plt.savefig(os.path.join(CHARTS_DIR, "bar", "reviews", f"bar_mean_{m}_by_reviews.png"))
-        plt.close()
-
-    
+        jobs.append(ChartJob(
+            os.path.join(CHARTS_DIR, "scatter", f"scatter_{m}_vs_reviews.png"), "scatter",
+            args=(df[m].to_numpy(), df["reviews_count"].to_numpy()), kwargs={"alpha": 0.5},
+            figsize=(6,4), title=f"{m} vs reviews_count", xlabel=m, ylabel="reviews_count", tight_layout=True,
+        ))
+
+    # Barras médias por status e por revisões
+    for group, sub, label in [("final_status_bin", "status", "PR status"), ("reviews_count", "reviews", "reviews_count")]:
+        means = df.groupby(group)[NUM_METRICS].mean().reset_index()
+        for m in NUM_METRICS:
+            jobs.append(ChartJob(
+                os.path.join(CHARTS_DIR, "bar", sub, f"bar_mean_{m}_by_{sub}.png"), "barplot", library="sns",
+                kwargs={"x": group, "y": m, "data": means[[group, m]], "hue": group,
+                        "legend": False, "palette": "viridis"},
+                figsize=(6,4), title=f"Mean {m} by {label}", tight_layout=True,
+            ))
+
+    render_charts(jobs)
 
 
 # ---------------- Análises ----------------
 
-def rq_status_analysis(df: pd.DataFrame):
+def rq_status_analysis(df: pd.DataFrame, kernel: RankStats):
     """Análise das RQs 1–4: relação das métricas com o status final (MERGED vs CLOSED)"""
     _write("Análise RQ A – Feedback final das revisões", header=True)
 
     # Correlações (Spearman)
-    s = _spearman_series(df, "final_status_bin")
+    s = _spearman_series(kernel, "final_status_bin")
     _write("\n### Correlação de Spearman com 'final_status_bin' (MERGED=1):")
     _write(s.to_markdown(index=False))
 
     # Teste de Mann–Whitney
     _write("\n### Teste de Mann–Whitney (diferença entre MERGED e CLOSED):")
-    rows = []
-    for m in NUM_METRICS:
-        merged = df[df.final_status == "MERGED"][m].dropna()
-        closed = df[df.final_status == "CLOSED"][m].dropna()
-        if len(merged) < 5 or len(closed) < 5:
-            continue
-        stat, p = stats.mannwhitneyu(merged, closed, alternative="two-sided")
-        rows.append({
-            "metric": m, 
-            "U": stat,
-            "p": p,
-            "significant": "YES" if p < 0.05 else "NO"
-        })
-    _write(pd.DataFrame(rows).to_markdown(index=False))
-
-def rq_reviews_analysis(df: pd.DataFrame):
+    mw = kernel.mann_whitney(df.final_status == "MERGED", df.final_status == "CLOSED", NUM_METRICS)
+    mw["significant"] = np.where(mw["p"] < 0.05, "YES", "NO")
+    _write(mw.to_markdown(index=False))
+
+def rq_reviews_analysis(df: pd.DataFrame, kernel: RankStats):
     """Análise das RQs 5–8: relação das métricas com o número de revisões"""
     _write("Análise RQ B – Número de revisões realizadas", header=True)
-    s = _spearman_series(df, "reviews_count")
+    s = _spearman_series(kernel, "reviews_count")
     _write("\n### Correlação de Spearman com 'reviews_count':")
     _write(s.to_markdown(index=False))
 
@@ -212,11 +233,12 @@ def median_summary(df: pd.DataFrame):
 
 # --------- Relatório narrativo Markdown (para entrega) ---------
 
-def generate_markdown_report(df: pd.DataFrame, path=os.path.join(DATA_DIR, "report_lab03.md")):
+def generate_markdown_report(df: pd.DataFrame, path=os.path.join(DATA_DIR, "report_lab03.md"), kernel: RankStats = None):
     med = df[NUM_METRICS + ["reviews_count"]].median().to_frame("median")
     # Correlações principais (Spearman)
-    s_status = df[NUM_METRICS + ["final_status_bin"]].corr(method="spearman")["final_status_bin"].drop("final_status_bin")
-    s_reviews = df[NUM_METRICS + ["reviews_count"]].corr(method="spearman")["reviews_count"].drop("reviews_count")
+    kernel = kernel or _rank_stats(df)
+    s_status = kernel.corr.loc[NUM_METRICS, "final_status_bin"]
+    s_reviews = kernel.corr.loc[NUM_METRICS, "reviews_count"]
 
     lines = []
     lines.append("# LAB-03 – Relatório Final\n")
@@ -242,14 +264,24 @@ def generate_markdown_report(df: pd.DataFrame, path=os.path.join(DATA_DIR, "repo
 def run_all(dataset_path: str = None):
     if os.path.exists(REPORT_PATH):
         os.remove(REPORT_PATH)
-    df = _load_dataset(dataset_path)
-    print(f"[i] Dataset carregado com {len(df)} PRs.")
-    df = _clean_outliers(df)
+    columns = NUM_METRICS + ["reviews_count", "final_status", "final_status_bin"]
+    store = open_pr_store()
+    rank_error = default_rank_error()
+    if dataset_path is None and len(store) and rank_error > 0:
+        # Fora da memória: limites por sketches em uma passada e corte partição a partição
+        thresholds = _streaming_thresholds(store, rank_error)
+        print(f"[i] Dataset com {store.rows()} PRs; limites de corte aproximados (erro de posição {rank_error}).")
+        df = store.read(columns=columns, where=lambda part: _within(part, thresholds))
+    else:
+        df = _load_dataset(dataset_path, columns=columns)
+        print(f"[i] Dataset carregado com {len(df)} PRs.")
+        df = _clean_outliers(df)
     print(f"[i] Dataset após remoção de outliers: {len(df)} PRs.")
     print(f"Numero de prs closed: {len(df[df.final_status=='CLOSED'])}")
     print(f"Numero de prs merged: {len(df[df.final_status=='MERGED'])}")
-    charts_basic(df)
+    kernel = _rank_stats(df)
+    charts_basic(df, kernel)
     median_summary(df)
-    rq_status_analysis(df)
-    rq_reviews_analysis(df)
+    rq_status_analysis(df, kernel)
+    rq_reviews_analysis(df, kernel)
     _write("\n---\nAnálise concluída. Resultados salvos em 'data/metrics_report.md' e gráficos em 'charts/'.")
@@ -1,8 +1,18 @@
+import glob
 import os
-from typing import Any, Dict, List
+import sys
+from datetime import timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
 
+import numpy as np
 import pandas as pd
-from gh_api import fetch_pull_requests, fetch_top_repositories
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from shared.partitioned_store import PartitionedStore
+
+from gh_api import PRRecord, fetch_pull_requests, fetch_top_repositories
+from pr_crawler import iter_pull_requests
+from pr_store import open_pr_store
 
 # Pastas de saída
 DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
@@ -11,8 +21,12 @@ PROC_DIR = os.path.join(DATA_DIR, "processed")
 os.makedirs(RAW_DIR, exist_ok=True)
 os.makedirs(PROC_DIR, exist_ok=True)
 
-def _end_time(pr: Dict[str, Any]):
-    return pr.get("mergedAt") or pr.get("closedAt")
+# Na sincronização incremental, volta alguns dias antes da marca para pegar PRs
+# que ainda estavam abertos na última coleta e foram fechados depois
+SYNC_LOOKBACK_DAYS = 7
+
+def _end_time(pr: PRRecord):
+    return pr.mergedAt or pr.closedAt
 
 def build_repos_list(n: int = 200, min_prs: int = 100, save_csv: bool = True) -> pd.DataFrame:
     repos = fetch_top_repositories(total=n, min_closed_or_merged_prs=min_prs)
@@ -21,71 +35,158 @@ def build_repos_list(n: int = 200, min_prs: int = 100, save_csv: bool = True) ->
         df.to_csv(os.path.join(RAW_DIR, f"repos_top{n}_min{min_prs}PRs.csv"), index=False)
     return df
 
-def build_prs_dataset(repos_df: pd.DataFrame, max_prs_per_repo: int = 500, save_intermediate: bool = True) -> pd.DataFrame:
-    rows: List[Dict[str, Any]] = []
-    RAW_INTERMEDIARY_DIR = os.path.join(RAW_DIR, f"repos_{len(repos_df)}")
-    os.makedirs(RAW_INTERMEDIARY_DIR, exist_ok=True)
-    for _, r in repos_df.iterrows():
-        repo = r["nameWithOwner"]
+KEEP_COLS = [
+    "repo","number","final_status","final_status_bin","analysis_hours",
+    "size_files","size_additions","size_deletions","desc_len_chars",
+    "interactions_participants","interactions_comments","reviews_count",
+    "createdAt","endTime","state","merged"
+]
+
+def _column(prs: List[PRRecord], field: str) -> List[Any]:
+    return [getattr(pr, field) for pr in prs]
+
+def _int_column(prs: List[PRRecord], field: str) -> np.ndarray:
+    return np.fromiter((getattr(pr, field) or 0 for pr in prs), dtype=np.int64, count=len(prs))
+
+def flatten_prs(repo: str, prs: List[PRRecord]) -> pd.DataFrame:
+    """
+    Converte os PRs coletados em colunas tipadas (uma passada por campo),
+    já com as métricas que não dependem de filtro.
+    """
+    merged = _column(prs, "merged")
+    return pd.DataFrame({
+        "repo": repo,
+        "number": _column(prs, "number"),
+        "state": _column(prs, "state"),
+        "merged": merged,
+        "final_status_bin": np.fromiter((bool(m) for m in merged), dtype=bool, count=len(prs)).astype(np.int64),
+        "createdAt": pd.to_datetime(_column(prs, "createdAt"), utc=True),
+        "endTime": pd.to_datetime([_end_time(pr) for pr in prs], utc=True),
+        "size_files": _int_column(prs, "changedFiles"),
+        "size_additions": _int_column(prs, "additions"),
+        "size_deletions": _int_column(prs, "deletions"),
+        "desc_len_chars": _int_column(prs, "desc_len"),
+        "interactions_participants": _int_column(prs, "participants"),
+        "interactions_comments": _int_column(prs, "comments") + _int_column(prs, "reviewThreads"),
+        "reviews_count": _int_column(prs, "reviews"),
+    })
+
+def _process_prs(repo: str, prs: List[PRRecord]) -> pd.DataFrame:
+    """Aplica filtros e calcula as métricas de um repositório."""
+    if not prs:
+        return pd.DataFrame(prs)
+    pr_df = flatten_prs(repo, prs)
+
+    # Filters from the PDF:
+    # 1) MERGED or CLOSED -> already ensured by the query
+    # 2) At least one review
+    # 3) Duration >= 1 hour
+    analysis_hours = (pr_df["endTime"] - pr_df["createdAt"]).dt.total_seconds() / 3600.0
+    keep = pr_df["endTime"].notna() & (pr_df["reviews_count"] >= 1) & (analysis_hours >= 1.0)
+    pr_df = pr_df[keep].assign(analysis_hours=analysis_hours[keep])
+    pr_df["final_status"] = np.where(pr_df["final_status_bin"] == 1, "MERGED", "CLOSED")
+
+    return pr_df[KEEP_COLS]
+
+def _high_water_mark(prs: List[PRRecord], previous: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """PR mais recente entre os coletados agora e a marca anterior."""
+    latest = max(prs, key=lambda pr: pr.createdAt, default=None)
+    if latest is None or (previous and previous["createdAt"] >= latest.createdAt):
+        return previous
+    return {"createdAt": latest.createdAt, "number": latest.number}
+
+def _sync_since(store: PartitionedStore, repo: str, lookback_days: int) -> str:
+    """Data ISO a partir da qual buscar PRs de um repositório já coletado."""
+    mark = store.meta(repo).get("high_water_mark")
+    # Partição sem marca d'água (importada de um CSV antigo): usa o PR mais recente dela
+    newest = pd.Timestamp(mark["createdAt"] if mark else store.manifest[repo]["date_max"])
+    since = newest.to_pydatetime().astimezone(timezone.utc) - timedelta(days=lookback_days)
+    return since.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _import_legacy_csvs(store: PartitionedStore, repos: List[str]):
+    """Leva para o armazenamento os arquivos raw/repos_N/prs_<repo>.csv de coletas antigas."""
+    for legacy_dir in sorted(glob.glob(os.path.join(RAW_DIR, "repos_*"))):
+        for repo in repos:
+            legacy_csv = os.path.join(legacy_dir, f"prs_{repo.replace('/', '_')}.csv")
+            if repo not in store and os.path.isfile(legacy_csv):
+                print(f"[i] Importando arquivo intermediário {legacy_csv}")
+                store.write(repo, pd.read_csv(legacy_csv))
+
+def merge_prs(existing: pd.DataFrame, new: pd.DataFrame, limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    Junta PRs novos aos já gravados; um PR que aparece nos dois fica com a
+    versão nova. Com `limit`, mantém só os `limit` PRs mais recentes, como
+    na coleta completa.
+    """
+    existing = existing.copy()
+    for col in ("createdAt", "endTime"):
+        existing[col] = pd.to_datetime(existing[col], utc=True)
+    merged = pd.concat([new, existing], ignore_index=True)
+    merged = merged.drop_duplicates(subset=["repo", "number"], keep="first")
+    merged = merged.sort_values("createdAt", ascending=False, kind="stable")[KEEP_COLS]
+    return merged.head(limit).reset_index(drop=True)
+
+def iter_prs_frames(repos_df: pd.DataFrame, max_prs_per_repo: int = 500, save_intermediate: bool = True,
+                    concurrency: int = 8, incremental: bool = False, lookback_days: int = SYNC_LOOKBACK_DAYS,
+                    store: Optional[PartitionedStore] = None) -> Iterator[pd.DataFrame]:
+    """
+    Gera o DataFrame processado de cada repositório, um por vez, na ordem de
+    repos_df. Os repositórios que ainda não têm partição no armazenamento
+    são coletados em paralelo (até `concurrency` requisições simultâneas;
+    1 = um por vez) e, com save_intermediate, gravados nele.
+
+    Com incremental=True, os repositórios já gravados também são consultados,
+    mas só até os PRs criados antes da marca d'água da última coleta (menos
+    `lookback_days`); os PRs novos são juntados à partição, que continua com
+    no máximo `max_prs_per_repo` PRs (os mais recentes). Sem isso, a
+    partição é reaproveitada como está.
+    """
+    store = store if store is not None else open_pr_store()
+    repos = list(repos_df["nameWithOwner"])
+    _import_legacy_csvs(store, repos)
+    to_fetch = [repo for repo in repos if incremental or repo not in store]
+    since = {repo: _sync_since(store, repo, lookback_days) for repo in to_fetch if repo in store}
+    if concurrency > 1:
+        fetched = iter_pull_requests(to_fetch, max_prs_per_repo=max_prs_per_repo, concurrency=concurrency, since=since)
+    else:
+        fetched = ((repo, fetch_pull_requests(repo, max_prs_per_repo=max_prs_per_repo, since=since.get(repo)))
+                   for repo in to_fetch)
+    pending = set(to_fetch)
+
+    for repo in repos:
         print(f"[>] Pegando PRs de {repo}...")
-        out_repo_csv = os.path.join(RAW_INTERMEDIARY_DIR, f"prs_{repo.replace('/', '_')}.csv")
-        if os.path.isfile(out_repo_csv):
-            print(f"[i] Usando arquivo intermediário {out_repo_csv}")
-            pr_df = pd.read_csv(out_repo_csv)
+        if repo not in pending:
+            print(f"[i] Usando partição já gravada de {repo}")
+            pr_df = store.read_partition(repo)
         else:
-            prs = fetch_pull_requests(repo, max_prs_per_repo=max_prs_per_repo)
-            pr_df = pd.DataFrame(prs)
+            _, prs = next(fetched)
+            mark = _high_water_mark(prs, store.meta(repo).get("high_water_mark"))
+            pr_df = _process_prs(repo, prs)
+            if repo in since:
+                print(f"[i] {len(prs)} PRs desde {since[repo]}, {len(pr_df)} após os filtros")
+                existing = store.read_partition(repo)
+                pr_df = (merge_prs(existing, pr_df, max_prs_per_repo) if not pr_df.empty
+                         else existing.sort_values("createdAt", ascending=False, kind="stable").head(max_prs_per_repo))
             if pr_df.empty:
                 continue
 
-            # Derived fields
-            pr_df["repo"] = repo
-            pr_df["endTime"] = pr_df["mergedAt"].fillna(pr_df["closedAt"])
-            pr_df["createdAt"] = pd.to_datetime(pr_df["createdAt"], utc=True)
-            pr_df["endTime"] = pd.to_datetime(pr_df["endTime"], utc=True)
-            pr_df = pr_df[~pr_df["endTime"].isna()]
-
-            # Filters from the PDF:
-            # 1) MERGED or CLOSED -> already ensured by the query
-            # 2) At least one review
-            pr_df = pr_df[pr_df["reviews"].apply(lambda x: (x or {}).get("totalCount", 0)) >= 1]
-            # 3) Duration >= 1 hour
-            pr_df["analysis_hours"] = (pr_df["endTime"] - pr_df["createdAt"]).dt.total_seconds() / 3600.0
-            pr_df = pr_df[pr_df["analysis_hours"] >= 1.0]
-
-            # Metrics (see PDF): size, time, description, interactions
-            pr_df["size_files"] = pr_df["changedFiles"].fillna(0).astype(int)
-            pr_df["size_additions"] = pr_df["additions"].fillna(0).astype(int)
-            pr_df["size_deletions"] = pr_df["deletions"].fillna(0).astype(int)
-            pr_df["desc_len_chars"] = pr_df["body"].fillna("").astype(str).str.len()
-            pr_df["interactions_participants"] = pr_df["participants"].apply(lambda x: (x or {}).get("totalCount", 0)).astype(int)
-            pr_df["interactions_comments"] = (
-                pr_df["comments"].apply(lambda x: (x or {}).get("totalCount", 0)).astype(int)
-                + pr_df["reviewThreads"].apply(lambda x: (x or {}).get("totalCount", 0)).astype(int)
-            )
-            pr_df["reviews_count"] = pr_df["reviews"].apply(lambda x: (x or {}).get("totalCount", 0)).astype(int)
-
-            pr_df["final_status"] = pr_df.apply(lambda row: "MERGED" if bool(row.get("merged")) else "CLOSED", axis=1)
-            pr_df["final_status_bin"] = (pr_df["final_status"] == "MERGED").astype(int)
-
-            keep_cols = [
-                "repo","number","final_status","final_status_bin","analysis_hours",
-                "size_files","size_additions","size_deletions","desc_len_chars",
-                "interactions_participants","interactions_comments","reviews_count",
-                "createdAt","endTime","state","merged"
-            ]
-            pr_df = pr_df[keep_cols]
-
             if save_intermediate:
-                pr_df.to_csv(out_repo_csv, index=False)
-
-        rows.append(pr_df)
+                store.write(repo, pr_df, high_water_mark=mark)
 
-    if not rows:
-        return pd.DataFrame()
+        yield pr_df
 
-    full = pd.concat(rows, ignore_index=True)
-    # Salva dataset processado
-    full.to_csv(os.path.join(PROC_DIR, "dataset_prs.csv"), index=False)
-    
-    return full
+def build_prs_dataset(repos_df: pd.DataFrame, max_prs_per_repo: int = 500, concurrency: int = 8,
+                      incremental: bool = False) -> str:
+    """
+    Monta o dataset de PRs no armazenamento particionado por repositório
+    (pr_store.PR_STORE_DIR): cada repositório é gravado na sua partição assim
+    que é coletado, sem reescrever as demais nem manter os outros em memória.
+    Com incremental=True, busca só os PRs novos dos repositórios já coletados
+    (ver iter_prs_frames). Retorna a pasta do armazenamento.
+    """
+    store = open_pr_store()
+    total = 0
+    for pr_df in iter_prs_frames(repos_df, max_prs_per_repo, True, concurrency, incremental, store=store):
+        total += len(pr_df)
+    print(f"[i] {total} PRs dos repositórios pedidos; {store.rows()} PRs de {len(store)} repositórios em {store.root}")
+    return store.root
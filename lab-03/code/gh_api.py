@@ -1,32 +1,32 @@
+import functools
 import os
+import re
+import sys
+import textwrap
 import time
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
-import requests
 from dotenv import load_dotenv
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from shared.checkpoint import CursorCheckpoint
+from shared.github_client import GQL_URL, GraphQLClient
+from shared.response_cache import ResponseCache
+
 load_dotenv()
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-if not GITHUB_TOKEN:
+# Cache em disco das respostas (GITHUB_OFFLINE=1 usa apenas o cache)
+cache = ResponseCache.from_env(os.path.join(os.path.dirname(__file__), "..", "data", "cache", "graphql"))
+if not GITHUB_TOKEN and not (cache and cache.offline):
     raise RuntimeError("GITHUB_TOKEN not found. Create a .env file (see .env.example).")
 
-GQL_URL = "https://api.github.com/graphql"
-HEADERS = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
+# Sessão HTTP compartilhada (keep-alive, gzip e retry centralizado)
+client = GraphQLClient(GITHUB_TOKEN, url=GQL_URL, timeout=30, cache=cache)
+
+CHECKPOINT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "checkpoints"))
 
 def _post_graphql(query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
-    for attempt in range(3):
-        resp = requests.post(GQL_URL, headers=HEADERS, json={"query": query, "variables": variables}, timeout=30)
-        if resp.status_code == 200:
-            data = resp.json()
-            if "errors" in data:
-                # Backoff when hitting rate limit or transient errors
-                time.sleep(2 + attempt * 2)
-                continue
-            return data["data"]
-        # GitHub rate limit backoff
-        time.sleep(2 + attempt * 2)
-    print(f"[X] Falha na requisição GraphQL após tentativas. Status final={resp.status_code}, corpo={resp.text[:300]}")
-    raise RuntimeError(f"GraphQL request failed after retries. Last status={resp.status_code}, body={resp.text[:300]}")
+    return client.execute(query, variables)
 
 def fetch_top_repositories(total: int = 200, min_closed_or_merged_prs: int = 100) -> List[Dict[str, Any]]:
     query = """
@@ -60,52 +60,198 @@ def fetch_top_repositories(total: int = 200, min_closed_or_merged_prs: int = 100
         after = search["pageInfo"]["endCursor"]
         if not search["pageInfo"]["hasNextPage"]:
             break
-        time.sleep(1)
+        if not client.last_cached:
+            time.sleep(1)
     print(f"[>]Total válido encontrado: {len(results)}")
     return results[:total]
 
 
+# Campos de cada PR usados nas métricas
+PR_NODE_FIELDS = """\
+number
+state
+merged
+createdAt
+mergedAt
+closedAt
+body
+changedFiles
+additions
+deletions
+comments { totalCount }
+reviewThreads { totalCount }
+participants { totalCount }
+reviews(states: [APPROVED, CHANGES_REQUESTED, COMMENTED, DISMISSED, PENDING]) { totalCount }
+"""
+
+class PRRecord:
+    """
+    PR coletado, só com os campos que o dataset usa.
+
+    O corpo do PR vira apenas o tamanho da descrição (desc_len) e as contagens
+    aninhadas ({ totalCount }) viram inteiros, o que reduz bastante a memória
+    de coletas com milhares de repositórios. Com keep_body=True o texto é
+    mantido em `body`.
+    """
+
+    __slots__ = (
+        "number", "state", "merged", "createdAt", "mergedAt", "closedAt",
+        "changedFiles", "additions", "deletions", "desc_len",
+        "comments", "reviewThreads", "participants", "reviews", "body",
+    )
+
+    def __init__(self, number, state, merged, createdAt, mergedAt, closedAt, changedFiles, additions, deletions,
+                 desc_len, comments, reviewThreads, participants, reviews, body=None):
+        self.number = number
+        self.state = state
+        self.merged = merged
+        self.createdAt = createdAt
+        self.mergedAt = mergedAt
+        self.closedAt = closedAt
+        self.changedFiles = changedFiles
+        self.additions = additions
+        self.deletions = deletions
+        self.desc_len = desc_len
+        self.comments = comments
+        self.reviewThreads = reviewThreads
+        self.participants = participants
+        self.reviews = reviews
+        self.body = body
+
+    @classmethod
+    def from_node(cls, node: Dict[str, Any], keep_body: bool = False) -> "PRRecord":
+        """Converte um nó do GraphQL (ver PR_NODE_FIELDS)."""
+        body = node.get("body") or ""
+        return cls(
+            number=node.get("number"),
+            state=node.get("state"),
+            merged=node.get("merged"),
+            createdAt=node.get("createdAt"),
+            mergedAt=node.get("mergedAt"),
+            closedAt=node.get("closedAt"),
+            changedFiles=node.get("changedFiles"),
+            additions=node.get("additions"),
+            deletions=node.get("deletions"),
+            desc_len=len(body),
+            comments=_total_count(node, "comments"),
+            reviewThreads=_total_count(node, "reviewThreads"),
+            participants=_total_count(node, "participants"),
+            reviews=_total_count(node, "reviews"),
+            body=body if keep_body else None,
+        )
+
+    def __repr__(self):
+        return f"PRRecord(number={self.number}, state={self.state}, createdAt={self.createdAt})"
 
-def fetch_pull_requests(name_with_owner: str, max_prs_per_repo: int = 500) -> List[Dict[str, Any]]:
-    """PRs MERGED/CLOSED, com campos necessários para métricas/arquivos/contagens/reviews."""
+
+def _total_count(node: Dict[str, Any], field: str) -> int:
+    return (node.get(field) or {}).get("totalCount", 0)
+
+
+def to_records(nodes: List[Dict[str, Any]], keep_body: bool = False) -> List[PRRecord]:
+    return [PRRecord.from_node(node, keep_body) for node in nodes]
+
+
+PR_CONNECTION_ARGS = "states: [MERGED, CLOSED], orderBy: {field: CREATED_AT, direction: DESC}"
+
+# PRs MERGED/CLOSED mais recentes primeiro, com os campos usados nas métricas
+PRS_QUERY = f"""
+query prs($owner: String!, $name: String!, $pageSize: Int!, $after: String) {{
+  repository(owner: $owner, name: $name) {{
+    pullRequests({PR_CONNECTION_ARGS}, first: $pageSize, after: $after) {{
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{
+{textwrap.indent(PR_NODE_FIELDS, " " * 8)}      }}
+    }}
+  }}
+}}
+"""
+
+PR_PAGE_SIZE = 30
+
+
+def pr_checkpoint(name_with_owner: str, max_prs_per_repo: int, since: Optional[str] = None) -> CursorCheckpoint:
     owner, name = name_with_owner.split("/")
-    query = """
-    query prs($owner: String!, $name: String!, $pageSize: Int!, $after: String) {
-      repository(owner: $owner, name: $name) {
-        pullRequests(states: [MERGED, CLOSED], orderBy: {field: CREATED_AT, direction: DESC}, first: $pageSize, after: $after) {
-          pageInfo { hasNextPage endCursor }
-          nodes {
-            number
-            state
-            merged
-            createdAt
-            mergedAt
-            closedAt
-            body
-            changedFiles
-            additions
-            deletions
-            comments { totalCount }
-            reviewThreads { totalCount }
-            participants { totalCount }
-            reviews(states: [APPROVED, CHANGES_REQUESTED, COMMENTED, DISMISSED, PENDING]) { totalCount }
-          }
-        }
-      }
-    }
+    suffix = f"_since{re.sub(r'[^0-9]', '', since)}" if since else ""
+    return CursorCheckpoint(os.path.join(CHECKPOINT_DIR, f"prs_{owner}_{name}_{max_prs_per_repo}{suffix}.jsonl"))
+
+
+def cut_at(nodes: List[Dict[str, Any]], since: Optional[str]) -> Tuple[List[Dict[str, Any]], bool]:
     """
-    out: List[Dict[str, Any]] = []
-    after = None
-    page_size = 30
-    while len(out) < max_prs_per_repo:
-        data = _post_graphql(query, {"owner": owner, "name": name, "pageSize": page_size, "after": after})
+    Separa de uma página (ordenada por createdAt decrescente) os PRs criados
+    a partir de `since` (ISO 8601, UTC). Retorna (PRs mantidos, chegou aos PRs
+    antigos), indicando se a paginação pode parar.
+    """
+    if since is None:
+        return nodes, False
+    kept = [pr for pr in nodes if pr["createdAt"] >= since]
+    return kept, len(kept) < len(nodes)
+
+
+@functools.lru_cache(maxsize=None)
+def _batch_prs_query(size: int) -> str:
+    """Query com `size` aliases r0..rN, cada um com seu repositório, cursor e tamanho de página."""
+    params = ", ".join(f"$o{i}: String!, $n{i}: String!, $f{i}: Int!, $a{i}: String" for i in range(size))
+    aliases = "".join(
+        f"""
+  r{i}: repository(owner: $o{i}, name: $n{i}) {{
+    pullRequests({PR_CONNECTION_ARGS}, first: $f{i}, after: $a{i}) {{
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{ ...prFields }}
+    }}
+  }}"""
+        for i in range(size)
+    )
+    fragment = textwrap.indent(PR_NODE_FIELDS, "  ")
+    return f"query prsBatch({params}) {{{aliases}\n}}\n\nfragment prFields on PullRequest {{\n{fragment}}}\n"
+
+
+def fetch_pr_pages_batch(requests: List[Tuple[str, Optional[str], int]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Busca em uma única requisição uma página de PRs de cada repositório pedido.
+    `requests` traz (nameWithOwner, cursor, tamanho da página); o retorno traz,
+    na mesma ordem, o objeto pullRequests de cada um (None se o repositório
+    não existir).
+    """
+    variables: Dict[str, Any] = {}
+    for i, (name_with_owner, after, first) in enumerate(requests):
+        owner, name = name_with_owner.split("/")
+        variables.update({f"o{i}": owner, f"n{i}": name, f"f{i}": first, f"a{i}": after})
+    data = _post_graphql(_batch_prs_query(len(requests)), variables)
+    return [(data.get(f"r{i}") or {}).get("pullRequests") for i in range(len(requests))]
+
+
+def fetch_pull_requests(name_with_owner: str, max_prs_per_repo: int = 500, resume: bool = True,
+                        since: Optional[str] = None, keep_body: bool = False) -> List[PRRecord]:
+    """PRs MERGED/CLOSED, com campos necessários para métricas/arquivos/contagens/reviews.
+
+    Cada página é confirmada em um checkpoint em disco; com resume=True uma
+    coleta interrompida continua a partir do último cursor confirmado.
+    Com `since`, só traz os PRs criados a partir dessa data e para de paginar
+    ao chegar nos mais antigos (a query ordena por createdAt decrescente).
+    Os PRs vêm como PRRecord, sem o texto da descrição (a menos que keep_body=True).
+    """
+    owner, name = name_with_owner.split("/")
+    checkpoint = pr_checkpoint(name_with_owner, max_prs_per_repo, since)
+    if not resume:
+        checkpoint.clear()
+    nodes, after, has_next = checkpoint.load()
+    out = to_records(nodes, keep_body)
+    if out:
+        print(f"[i] Retomando {name_with_owner} a partir do checkpoint ({len(out)} PRs já coletados)")
+
+    page_size = PR_PAGE_SIZE
+    while has_next and len(out) < max_prs_per_repo:
+        data = _post_graphql(PRS_QUERY, {"owner": owner, "name": name, "pageSize": page_size, "after": after})
         pr_page = data["repository"]["pullRequests"]
-        for pr in pr_page["nodes"]:
-            out.append(pr)
-            if len(out) >= max_prs_per_repo:
-                break
-        if not pr_page["pageInfo"]["hasNextPage"]:
-            break
+        nodes, reached_known = cut_at(pr_page["nodes"], since)
+        out.extend(to_records(nodes, keep_body))
         after = pr_page["pageInfo"]["endCursor"]
-        time.sleep(0.5)
-    return out
+        has_next = pr_page["pageInfo"]["hasNextPage"] and not reached_known
+        checkpoint.commit(nodes, after, has_next)
+        if not has_next:
+            break
+        if not client.last_cached:
+            time.sleep(0.5)
+    checkpoint.clear()
+    return out[:max_prs_per_repo]
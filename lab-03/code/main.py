@@ -45,10 +45,11 @@ def main():
                     print("[X] Escolha inválida. Digite um número entre 10 e 500.")
                     continue
 
+                incremental = input("Buscar apenas PRs novos dos repositórios já coletados? (s/N) ").strip().lower() == "s"
+
                 print(f"Buscando até {max_prs} PRs por repositório...")
-                prs_df = build_prs_dataset(repos_df, max_prs_per_repo=max_prs, save_intermediate=True)
-                
-                print(f"[!] Dados salvos em {os.path.join(PROC_DIR, 'dataset_prs.csv')}")
+                dataset_path = build_prs_dataset(repos_df, max_prs_per_repo=max_prs, incremental=incremental)
+                print(f"[!] Dados salvos em {dataset_path}")
                 
             elif(option == "3"):
                 print("Analisando dados dos PRs...")
@@ -0,0 +1,313 @@
+import asyncio
+import concurrent.futures
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from gh_api import (PR_PAGE_SIZE, PRS_QUERY, PRRecord, _post_graphql, client, cut_at, fetch_pr_pages_batch,
+                    pr_checkpoint, to_records)
+from shared.checkpoint import CursorCheckpoint
+from shared.github_client import GraphQLError
+
+
+class AdaptiveLimit:
+    """
+    Limite de requisições simultâneas que se ajusta aos limites secundários
+    do GitHub (aumento aditivo, redução multiplicativa).
+
+    Cada `limit` respostas seguidas sem recusa liberam mais uma vaga, até
+    `maximum`. Uma recusa por limite de taxa corta o limite pela metade e
+    pausa todas as novas requisições pelo tempo do Retry-After.
+    """
+
+    def __init__(self, initial: int = 8, maximum: int = 16, minimum: int = 1):
+        self.limit = initial
+        self.maximum = maximum
+        self.minimum = minimum
+        self._active = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._cond: Optional[asyncio.Condition] = None
+
+    async def __aenter__(self):
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        async with self._cond:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout=pause)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self._active < self.limit:
+                    break
+                await self._cond.wait()
+            self._active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._cond:
+            self._active -= 1
+            if exc_type is None:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    def rate_limited(self, wait: float):
+        """Recusa por limite secundário: reduz o limite e pausa (chamado no loop)."""
+        self.limit = max(self.minimum, self.limit // 2)
+        self._successes = 0
+        self._paused_until = max(self._paused_until, time.monotonic() + wait)
+        print(f"[!] Limite secundário do GitHub: concorrência reduzida para {self.limit}, pausa de {wait:.0f}s")
+
+
+async def _crawl_repo(name_with_owner: str, max_prs_per_repo: int, limiter: AdaptiveLimit, resume: bool,
+                      executor: concurrent.futures.Executor, since: Optional[str] = None,
+                      keep_body: bool = False) -> List[PRRecord]:
+    owner, name = name_with_owner.split("/")
+    checkpoint = pr_checkpoint(name_with_owner, max_prs_per_repo, since)
+    if not resume:
+        checkpoint.clear()
+    nodes, after, has_next = checkpoint.load()
+    out = to_records(nodes, keep_body)
+    if out:
+        print(f"[i] Retomando {name_with_owner} a partir do checkpoint ({len(out)} PRs já coletados)")
+
+    while has_next and len(out) < max_prs_per_repo:
+        variables = {"owner": owner, "name": name, "pageSize": PR_PAGE_SIZE, "after": after}
+        async with limiter:
+            data = await asyncio.get_running_loop().run_in_executor(executor, _post_graphql, PRS_QUERY, variables)
+        pr_page = data["repository"]["pullRequests"]
+        nodes, reached_known = cut_at(pr_page["nodes"], since)
+        out.extend(to_records(nodes, keep_body))
+        after = pr_page["pageInfo"]["endCursor"]
+        has_next = pr_page["pageInfo"]["hasNextPage"] and not reached_known
+        checkpoint.commit(nodes, after, has_next)
+    checkpoint.clear()
+    return out[:max_prs_per_repo]
+
+
+# Orçamento padrão de nós por requisição em lote: 10 repositórios x 30 PRs
+DEFAULT_NODE_BUDGET = 300
+
+
+@dataclass
+class _RepoCursor:
+    """Estado da paginação de PRs de um repositório no modo em lote."""
+    repo: str
+    checkpoint: CursorCheckpoint
+    prs: List[PRRecord] = field(default_factory=list)
+    after: Optional[str] = None
+    has_next: bool = True
+    since: Optional[str] = None
+    keep_body: bool = False
+
+    def page_size(self, max_prs_per_repo: int) -> int:
+        return min(PR_PAGE_SIZE, max_prs_per_repo - len(self.prs))
+
+    def advance(self, pr_page: Dict[str, Any]):
+        nodes, reached_known = cut_at(pr_page["nodes"], self.since)
+        self.prs.extend(to_records(nodes, self.keep_body))
+        self.after = pr_page["pageInfo"]["endCursor"]
+        self.has_next = pr_page["pageInfo"]["hasNextPage"] and not reached_known
+        self.checkpoint.commit(nodes, self.after, self.has_next)
+
+
+def _take_batch(ready: Deque[_RepoCursor], max_prs_per_repo: int, node_budget: int) -> List[_RepoCursor]:
+    """Retira da fila os cursores que cabem no orçamento de nós (ao menos um)."""
+    batch, cost = [], 0
+    while ready:
+        size = ready[0].page_size(max_prs_per_repo)
+        if batch and cost + size > node_budget:
+            break
+        batch.append(ready.popleft())
+        cost += size
+    return batch
+
+
+async def _crawl_batched(repos: List[str], max_prs_per_repo: int, limiter: AdaptiveLimit, resume: bool,
+                         executor: concurrent.futures.Executor, node_budget: int,
+                         since: Dict[str, str], keep_body: bool) -> AsyncIterator[Tuple[str, List[PRRecord]]]:
+    """
+    Junta os cursores ativos de vários repositórios em uma query com aliases
+    (r0, r1, ...) e distribui cada página de volta ao seu repositório. Cada
+    requisição pede no máximo `node_budget` PRs no total, o que mantém o custo
+    da query no limite de taxa igual ao de uma página avulsa por repositório,
+    mas com bem menos idas e vindas.
+    """
+    loop = asyncio.get_running_loop()
+    ready: Deque[_RepoCursor] = deque()
+    finished: "asyncio.Queue[Union[Tuple[str, List[PRRecord]], BaseException]]" = asyncio.Queue()
+    wakeup = asyncio.Event()
+
+    def finish(cursor: _RepoCursor, prs: Optional[List[PRRecord]] = None):
+        cursor.checkpoint.clear()
+        finished.put_nowait((cursor.repo, cursor.prs[:max_prs_per_repo] if prs is None else prs))
+
+    def requeue(cursor: _RepoCursor):
+        if cursor.has_next and len(cursor.prs) < max_prs_per_repo:
+            ready.append(cursor)
+            wakeup.set()
+        else:
+            finish(cursor)
+
+    for repo in repos:
+        checkpoint = pr_checkpoint(repo, max_prs_per_repo, since.get(repo))
+        if not resume:
+            checkpoint.clear()
+        nodes, after, has_next = checkpoint.load()
+        if nodes:
+            print(f"[i] Retomando {repo} a partir do checkpoint ({len(nodes)} PRs já coletados)")
+        prs = to_records(nodes, keep_body)
+        requeue(_RepoCursor(repo, checkpoint, prs, after, has_next, since.get(repo), keep_body))
+
+    async def fetch_alone(cursor: _RepoCursor):
+        # Fallback quando o lote falha: isola o repositório problemático
+        owner, name = cursor.repo.split("/")
+        variables = {"owner": owner, "name": name, "pageSize": cursor.page_size(max_prs_per_repo), "after": cursor.after}
+        try:
+            async with limiter:
+                data = await loop.run_in_executor(executor, _post_graphql, PRS_QUERY, variables)
+            cursor.advance(data["repository"]["pullRequests"])
+        except (GraphQLError, KeyError, TypeError) as e:
+            print(f"[X] Falha ao coletar PRs de {cursor.repo}: {e}")
+            finish(cursor, [])
+            return
+        requeue(cursor)
+
+    async def fetch_batches():
+        while True:
+            while not ready:
+                wakeup.clear()
+                await wakeup.wait()
+            batch = _take_batch(ready, max_prs_per_repo, node_budget)
+            requests = [(c.repo, c.after, c.page_size(max_prs_per_repo)) for c in batch]
+            try:
+                async with limiter:
+                    pages = await loop.run_in_executor(executor, fetch_pr_pages_batch, requests)
+            except GraphQLError as e:
+                print(f"[!] Lote de {len(batch)} repositórios falhou ({e}); buscando um a um")
+                await asyncio.gather(*(fetch_alone(c) for c in batch))
+                continue
+            for cursor, pr_page in zip(batch, pages):
+                if pr_page is None:
+                    print(f"[X] Falha ao coletar PRs de {cursor.repo}: repositório não encontrado")
+                    finish(cursor, [])
+                    continue
+                cursor.advance(pr_page)
+                requeue(cursor)
+
+    async def worker():
+        # Qualquer outra falha (ex.: CacheMissError offline, erro de disco no
+        # checkpoint) vai para a fila e é relançada para quem consome
+        try:
+            await fetch_batches()
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            finished.put_nowait(e)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(limiter.maximum)]
+    try:
+        for _ in range(len(repos)):
+            item = await finished.get()
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def crawl_pull_requests(repos: Iterable[str], max_prs_per_repo: int = 500, concurrency: int = 8,
+                              max_concurrency: int = 10, resume: bool = True,
+                              node_budget: int = DEFAULT_NODE_BUDGET, since: Optional[Dict[str, str]] = None,
+                              keep_body: bool = False):
+    """
+    Percorre os cursores de PRs de vários repositórios ao mesmo tempo.
+    Gera (repositório, PRs) à medida que cada repositório termina; um
+    repositório que falha após os retries do cliente gera lista vazia.
+    O padrão de max_concurrency acompanha o pool de conexões do cliente (10).
+    Com node_budget > 0, várias páginas vão em cada requisição (ver _crawl_batched);
+    com 0, cada repositório pagina sozinho. `since` mapeia repositório ->
+    data ISO a partir da qual buscar (sincronização incremental). Os PRs vêm
+    como PRRecord, sem o texto da descrição a menos que keep_body=True.
+    """
+    since = since or {}
+    loop = asyncio.get_running_loop()
+    limiter = AdaptiveLimit(initial=concurrency, maximum=max(concurrency, max_concurrency))
+    # As requisições HTTP (bloqueantes) rodam em threads; uma por vaga do limite
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=limiter.maximum)
+    previous_hook = client.on_rate_limit
+    client.on_rate_limit = lambda wait: loop.call_soon_threadsafe(limiter.rate_limited, wait)
+
+    async def run(repo: str) -> Tuple[str, List[PRRecord]]:
+        try:
+            return repo, await _crawl_repo(repo, max_prs_per_repo, limiter, resume, executor, since.get(repo), keep_body)
+        except (GraphQLError, KeyError, TypeError) as e:
+            print(f"[X] Falha ao coletar PRs de {repo}: {e}")
+            return repo, []
+
+    try:
+        if node_budget > 0:
+            async for item in _crawl_batched(list(repos), max_prs_per_repo, limiter, resume, executor, node_budget, since,
+                                             keep_body):
+                yield item
+        else:
+            for finished in asyncio.as_completed([run(repo) for repo in repos]):
+                yield await finished
+    finally:
+        client.on_rate_limit = previous_hook
+        executor.shutdown(wait=False)
+
+
+def iter_pull_requests(repos: List[str], max_prs_per_repo: int = 500, concurrency: int = 8, resume: bool = True,
+                       node_budget: int = DEFAULT_NODE_BUDGET,
+                       since: Optional[Dict[str, str]] = None,
+                       keep_body: bool = False) -> Iterator[Tuple[str, List[PRRecord]]]:
+    """
+    Versão síncrona de crawl_pull_requests para o pipeline do dataset: o loop
+    asyncio roda em uma thread e os resultados saem na ordem de `repos`.
+    """
+    results: "queue.Queue" = queue.Queue()
+    done = object()
+
+    def worker():
+        async def consume():
+            async for item in crawl_pull_requests(repos, max_prs_per_repo, concurrency, resume=resume,
+                                                   node_budget=node_budget, since=since, keep_body=keep_body):
+                results.put(item)
+
+        try:
+            asyncio.run(consume())
+        except BaseException as e:
+            results.put(e)
+        finally:
+            results.put(done)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+
+    pending: Dict[str, List[PRRecord]] = {}
+    order = iter(repos)
+    next_repo = next(order, None)
+    while True:
+        item = results.get()
+        if item is done:
+            break
+        if isinstance(item, BaseException):
+            raise item
+        repo, prs = item
+        pending[repo] = prs
+        while next_repo is not None and next_repo in pending:
+            yield next_repo, pending.pop(next_repo)
+            next_repo = next(order, None)
+    thread.join()
@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from shared.columnar_store import DATETIME
+from shared.partitioned_store import PartitionedStore
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
+# Uma partição por repositório e um manifesto com linhas e intervalo de datas
+PR_STORE_DIR = os.path.join(DATA_DIR, "processed", "prs_store")
+
+# Tipos do dataset de PRs (ver dataset.KEEP_COLS)
+PRS_SCHEMA = {
+    "repo": "category",
+    "number": "int64",
+    "final_status": "category",
+    "final_status_bin": "int8",
+    "analysis_hours": "float64",
+    "size_files": "int32",
+    "size_additions": "int64",
+    "size_deletions": "int64",
+    "desc_len_chars": "int32",
+    "interactions_participants": "int32",
+    "interactions_comments": "int32",
+    "reviews_count": "int32",
+    "createdAt": DATETIME,
+    "endTime": DATETIME,
+    "state": "category",
+    "merged": "bool",
+}
+
+
+def open_pr_store(root: str = PR_STORE_DIR) -> PartitionedStore:
+    return PartitionedStore(root, PRS_SCHEMA, key_column="repo", date_column="createdAt")
@@ -0,0 +1,174 @@
+from functools import cached_property
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Elementos (amostras x linhas x colunas) ranqueados por bloco no bootstrap
+BOOTSTRAP_CHUNK = 4_000_000
+# Como no scipy: grupo com até este tamanho e sem empates usa o Mann–Whitney exato
+MANN_WHITNEY_EXACT_MAX_N = 8
+
+
+class RankStats:
+    """
+    Estatísticas baseadas em postos calculadas a partir de um único ranqueamento.
+
+    As colunas são ranqueadas uma vez (postos médios para empates). Spearman
+    é a correlação de Pearson desses postos, obtida para todos os pares com
+    um produto de matrizes, e o Mann–Whitney sai da soma dos postos de cada
+    grupo. Os resultados batem com scipy.stats.spearmanr/mannwhitneyu: o
+    Mann–Whitney é assintótico (com correção de continuidade e de empates),
+    exceto quando o scipy escolheria o teste exato (um grupo com até 8
+    valores e sem empates), caso em que a métrica usa o próprio scipy.
+    Colunas com valores ausentes usam o cálculo par a par do scipy.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: List[str]):
+        self.df = df
+        self.columns = list(columns)
+        self.values = df[self.columns].to_numpy(dtype=float)
+        self.n = len(df)
+        self.has_na = bool(np.isnan(self.values).any())
+
+    @cached_property
+    def ranks(self) -> np.ndarray:
+        return stats.rankdata(self.values, axis=0)
+
+    @cached_property
+    def _standardized(self) -> np.ndarray:
+        centered = self.ranks - self.ranks.mean(axis=0)
+        scale = np.sqrt((centered ** 2).sum(axis=0))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return centered / scale
+
+    @cached_property
+    def corr(self) -> pd.DataFrame:
+        """Matriz de Spearman entre todas as colunas."""
+        if self.has_na:
+            return self.df[self.columns].corr(method="spearman")
+        matrix = np.clip(self._standardized.T @ self._standardized, -1.0, 1.0)
+        np.fill_diagonal(matrix, 1.0)
+        return pd.DataFrame(matrix, index=self.columns, columns=self.columns)
+
+    def spearman(self, y: str, metrics: List[str], min_n: int = 5) -> pd.DataFrame:
+        """Spearman de cada métrica com y: colunas metric, rho, p (teste t com n-2 g.l.)."""
+        if self.has_na:
+            return self._spearman_pairwise(y, metrics, min_n)
+        if self.n < min_n:
+            return pd.DataFrame(columns=["metric", "rho", "p"])
+        rho = self.corr.loc[metrics, y].to_numpy()
+        dof = self.n - 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = rho * np.sqrt(dof / ((1.0 - rho) * (1.0 + rho)))
+        p = 2 * stats.t.sf(np.abs(t), dof)
+        return pd.DataFrame({"metric": metrics, "rho": rho, "p": p})
+
+    def _spearman_pairwise(self, y: str, metrics: List[str], min_n: int) -> pd.DataFrame:
+        rows = []
+        for x in metrics:
+            s = self.df[[x, y]].dropna()
+            if len(s) < min_n:
+                continue
+            rho, p = stats.spearmanr(s[x], s[y])
+            rows.append({"metric": x, "rho": rho, "p": p})
+        return pd.DataFrame(rows, columns=["metric", "rho", "p"])
+
+    def mann_whitney(self, group_a: pd.Series, group_b: pd.Series, metrics: List[str],
+                     min_n: int = 5) -> pd.DataFrame:
+        """
+        Mann–Whitney bicaudal entre os grupos (máscaras booleanas) para cada
+        métrica: colunas metric, U (do grupo a) e p.
+        """
+        a = np.asarray(group_a, dtype=bool)
+        b = np.asarray(group_b, dtype=bool)
+        n1, n2 = int(a.sum()), int(b.sum())
+        if n1 < min_n or n2 < min_n:
+            return pd.DataFrame(columns=["metric", "U", "p"])
+        if self.has_na:
+            return self._mann_whitney_pairwise(a, b, metrics, min_n)
+
+        idx = [self.columns.index(m) for m in metrics]
+        if (a | b).all():
+            ranks = self.ranks[:, idx]
+            in_a = a
+        else:
+            ranks = stats.rankdata(self.values[a | b][:, idx], axis=0)
+            in_a = a[a | b]
+        u1 = ranks[in_a].sum(axis=0) - n1 * (n1 + 1) / 2.0
+        u2 = n1 * n2 - u1
+
+        n = n1 + n2
+        ties = np.array([_tie_term(ranks[:, j]) for j in range(ranks.shape[1])])
+        sigma = np.sqrt(n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1))))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (np.maximum(u1, u2) - n1 * n2 / 2.0 - 0.5) / sigma
+        p = np.clip(2 * stats.norm.sf(z), 0.0, 1.0)
+
+        if min(n1, n2) <= MANN_WHITNEY_EXACT_MAX_N:
+            for j in np.flatnonzero(ties == 0):
+                column = self.values[:, idx[j]]
+                p[j] = stats.mannwhitneyu(column[a], column[b], alternative="two-sided", method="exact").pvalue
+        return pd.DataFrame({"metric": metrics, "U": u1, "p": p})
+
+    def _mann_whitney_pairwise(self, a: np.ndarray, b: np.ndarray, metrics: List[str], min_n: int) -> pd.DataFrame:
+        rows = []
+        for m in metrics:
+            x = self.df[m][a].dropna()
+            y = self.df[m][b].dropna()
+            if len(x) < min_n or len(y) < min_n:
+                continue
+            stat, p = stats.mannwhitneyu(x, y, alternative="two-sided")
+            rows.append({"metric": m, "U": stat, "p": p})
+        return pd.DataFrame(rows, columns=["metric", "U", "p"])
+
+    def bootstrap_spearman(self, y: str, metrics: List[str], samples: int = 1000, confidence: float = 0.95,
+                           seed: Optional[int] = 0) -> pd.DataFrame:
+        """
+        Intervalos de confiança (percentil) do Spearman de cada métrica com y.
+        Retorna metric, ci_low e ci_high. As reamostragens são as mesmas para
+        todos os alvos (ver _bootstrap_corr), então pedir vários y custa uma só rodada.
+        """
+        if self.has_na or self.n < 3:
+            return pd.DataFrame({"metric": metrics, "ci_low": np.nan, "ci_high": np.nan})
+
+        estimates = self._bootstrap_corr(samples, seed)
+        rows = [self.columns.index(m) for m in metrics]
+        tail = (1.0 - confidence) / 2.0 * 100
+        low, high = np.nanpercentile(estimates[:, rows, self.columns.index(y)], [tail, 100 - tail], axis=0)
+        return pd.DataFrame({"metric": metrics, "ci_low": low, "ci_high": high})
+
+    def _bootstrap_corr(self, samples: int, seed: Optional[int]) -> np.ndarray:
+        """
+        Matrizes de Spearman (amostras x colunas x colunas) de cada reamostragem.
+        Cada uma sorteia linhas com reposição e reranqueia os postos já
+        calculados (a ordem é a mesma dos valores), em blocos de amostras para
+        limitar a memória. O resultado fica guardado por (samples, seed).
+        """
+        cache = self.__dict__.setdefault("_bootstrap_cache", {})
+        if (samples, seed) in cache:
+            return cache[samples, seed]
+
+        rng = np.random.default_rng(seed)
+        width = len(self.columns)
+        chunk = max(1, BOOTSTRAP_CHUNK // (self.n * width))
+        estimates = []
+        for start in range(0, samples, chunk):
+            size = min(chunk, samples - start)
+            rows = rng.integers(0, self.n, size=(size, self.n))
+            resampled = stats.rankdata(self.ranks[rows], axis=1)
+            centered = resampled - resampled.mean(axis=1, keepdims=True)
+            scale = np.sqrt((centered ** 2).sum(axis=1))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                rho = np.einsum("bni,bnj->bij", centered, centered) / (scale[:, :, None] * scale[:, None, :])
+            estimates.append(rho)
+        cache[samples, seed] = np.concatenate(estimates)
+        return cache[samples, seed]
+
+
+def _tie_term(ranks: np.ndarray) -> float:
+    """Soma de t^3 - t sobre os grupos de empate (t = tamanho do grupo)."""
+    _, counts = np.unique(ranks, return_counts=True)
+    counts = counts.astype(float)
+    return float((counts ** 3 - counts).sum())
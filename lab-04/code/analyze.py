@@ -1,5 +1,27 @@
 import pandas as pd
 import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from shared.columnar_store import DATETIME, load_table
+
+# Tipos das tabelas do OpenAQ (mensal e anual têm o mesmo formato)
+SENSOR_DATA_SCHEMA = {
+    "city": "object",
+    "sensor_id": "int64",
+    "pollutant_name": "object",
+    "units": "object",
+    "value": "float64",
+    "avg": "float64",
+    "min": "float64",
+    "max": "float64",
+    "median": "float64",
+    "datetimeFrom_utc": DATETIME,
+    "datetimeTo_utc": DATETIME,
+    "percentCoverage": "float64",
+    "observedCount": "Int64",
+    "expectedCount": "Int64",
+}
 
 # =============================
 # 1. CARREGAR BASES
@@ -21,7 +43,7 @@ if not os.path.exists(yearly_file):
 if not os.path.exists(oms_limits_file):
     raise FileNotFoundError(f"Arquivo não encontrado: {oms_limits_file}")
 
-df = pd.read_csv(monthly_file)
+df = load_table(monthly_file, SENSOR_DATA_SCHEMA, columns=["city", "pollutant_name", "avg", "datetimeFrom_utc"])
 oms = pd.read_csv(oms_limits_file)
 
 if df.empty:
@@ -37,7 +59,6 @@ df["pollutant_name"] = df["pollutant_name"].str.lower().str.strip()
 oms["pollutant"] = oms["pollutant"].str.lower().str.strip()
 
 # Criar coluna de mês (YYYY-MM)
-df["datetimeFrom_utc"] = pd.to_datetime(df["datetimeFrom_utc"], errors="coerce")
 df["year_month"] = df["datetimeFrom_utc"].dt.to_period("M")
 
 # =============================
@@ -153,7 +174,10 @@ print("Arquivo salvo: ranking_cidades_por_poluente.csv")
 # ==========================================================
 # 8. GERAR CSV COM INFORMAÇÕES POR CIDADE
 # ==========================================================
-df_yearly = pd.read_csv(yearly_file)
+df_yearly = load_table(
+    yearly_file, SENSOR_DATA_SCHEMA,
+    columns=["city", "sensor_id", "datetimeFrom_utc", "datetimeTo_utc", "percentCoverage"],
+)
 
 
 # Total de sensores por cidade
@@ -173,14 +197,20 @@ periodo_por_cidade = (
             percent_coverage_medio=("percentCoverage", "mean")
         )
         .reset_index()
-        .round(2)
 )
+# Arredonda só as colunas numéricas (round em colunas de data só gera aviso)
+colunas_numericas = periodo_por_cidade.select_dtypes("number").columns
+periodo_por_cidade[colunas_numericas] = periodo_por_cidade[colunas_numericas].round(2)
 
 # Converter percentCoverage → anos equivalentes de coleta
 periodo_por_cidade["anos_equivalentes"] = ((periodo_por_cidade["percent_coverage_medio"]/100) * (
-    (pd.to_datetime(periodo_por_cidade["data_fim"]) - pd.to_datetime(periodo_por_cidade["data_inicio"])).dt.days / 365.25
+    (periodo_por_cidade["data_fim"] - periodo_por_cidade["data_inicio"]).dt.days / 365.25
 )).round(2)
 
+# Mantém as datas no formato ISO original do OpenAQ
+for col in ["data_inicio", "data_fim"]:
+    periodo_por_cidade[col] = periodo_por_cidade[col].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
 # Unir tudo
 info_cidades = sensores_por_cidade.merge(periodo_por_cidade, on="city", how="left")
 
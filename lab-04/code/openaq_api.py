@@ -11,7 +11,7 @@ import sys
 # -----------------------------------------------
 load_dotenv()
 API_KEY = os.getenv("OPENAQ_API_TOKEN")
-BASE_URL = "https://api.openaq.org/v3"
+BASE_URL = os.getenv("OPENAQ_BASE_URL", "https://api.openaq.org/v3")
 radius = 12000   # tamanho do raio em metros em redor do ponto central
 WAIT = 1.0    # segundos de espera entre requisições (evita rate limit)
 COUNTRY_ID = 45      # Brasil
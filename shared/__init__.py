@@ -0,0 +1 @@
+"""Módulos compartilhados entre os laboratórios."""
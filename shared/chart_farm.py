@@ -0,0 +1,111 @@
+import concurrent.futures
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass
+class ChartJob:
+    """
+    Descrição declarativa de um gráfico.
+
+    `plot` é o nome do método do Axes do matplotlib (ex.: "hist", "scatter")
+    ou, com library="sns", o nome da função do seaborn (ex.: "boxplot",
+    "heatmap"). `args`/`kwargs` são repassados à chamada; devem conter apenas
+    os dados necessários ao gráfico, pois o job é enviado a outro processo.
+    """
+
+    path: str
+    plot: str
+    args: Tuple[Any, ...] = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    library: str = "mpl"
+    title: Optional[str] = None
+    xlabel: Optional[str] = None
+    ylabel: Optional[str] = None
+    figsize: Optional[Tuple[float, float]] = None
+    grid: bool = False
+    xtick_rotation: Optional[float] = None
+    tight_layout: bool = False
+
+
+# Figuras reaproveitadas pelo processo, uma por tamanho
+_figures: Dict[Any, Any] = {}
+
+# Abaixo disso por worker, subir processos (e importar matplotlib/seaborn em
+# cada um) custa mais que renderizar tudo no processo atual
+MIN_JOBS_PER_WORKER = 4
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _get_figure(figsize):
+    # Figure avulsa (sem pyplot): salva com o Agg sem mexer no backend de quem chamou
+    from matplotlib.figure import Figure
+
+    fig = _figures.get(figsize)
+    if fig is None:
+        fig = Figure(figsize=figsize)
+        _figures[figsize] = fig
+    else:
+        fig.clf()
+    return fig
+
+
+def render_job(job: ChartJob) -> str:
+    fig = _get_figure(job.figsize)
+    ax = fig.add_subplot()
+
+    if job.library == "sns":
+        import seaborn as sns
+        getattr(sns, job.plot)(*job.args, ax=ax, **job.kwargs)
+    else:
+        getattr(ax, job.plot)(*job.args, **job.kwargs)
+
+    if job.title is not None:
+        ax.set_title(job.title)
+    if job.xlabel is not None:
+        ax.set_xlabel(job.xlabel)
+    if job.ylabel is not None:
+        ax.set_ylabel(job.ylabel)
+    if job.grid:
+        ax.grid(True)
+    if job.xtick_rotation is not None:
+        ax.tick_params(axis="x", labelrotation=job.xtick_rotation)
+    if job.tight_layout:
+        fig.tight_layout()
+
+    os.makedirs(os.path.dirname(job.path) or ".", exist_ok=True)
+    fig.savefig(job.path)
+    return job.path
+
+
+def _render_batch(jobs: List[ChartJob]) -> List[str]:
+    return [render_job(job) for job in jobs]
+
+
+def render_charts(jobs: List[ChartJob], workers: Optional[int] = None) -> List[str]:
+    """
+    Renderiza os gráficos em paralelo em um pool de processos com backend Agg.
+    Os jobs são distribuídos de forma intercalada em um lote por worker, e cada worker
+    reaproveita a mesma figura entre os gráficos do lote.
+    Com um só núcleo, workers=1 ou poucos jobs (menos de MIN_JOBS_PER_WORKER
+    por worker) tudo é renderizado no processo atual.
+    """
+    if not jobs:
+        return []
+    workers = workers or int(os.getenv("CHART_WORKERS", "0")) or os.cpu_count() or 1
+    workers = min(workers, len(jobs) // MIN_JOBS_PER_WORKER)
+
+    if workers <= 1:
+        return _render_batch(jobs)
+
+    batches = [jobs[i::workers] for i in range(workers)]
+    paths = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        for batch_paths in executor.map(_render_batch, batches):
+            paths.extend(batch_paths)
+    return paths
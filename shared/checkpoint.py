@@ -0,0 +1,64 @@
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class CursorCheckpoint:
+    """
+    Checkpoint de uma coleta paginada por cursor.
+
+    Cada página confirmada vira uma linha JSON (nós + endCursor + hasNextPage)
+    anexada ao arquivo e sincronizada em disco com fsync. Como o arquivo só
+    cresce, uma queda no meio da escrita deixa no máximo a última linha
+    incompleta, que é descartada ao retomar.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def iter_pages(self) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str], bool]]:
+        """Gera as páginas confirmadas como (nós, endCursor, hasNextPage), uma por vez."""
+        if not self.exists():
+            return
+
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    page = json.loads(line)
+                except ValueError:
+                    # Linha truncada por uma queda durante a escrita
+                    break
+                valid_bytes += len(line)
+                yield page["nodes"], page["endCursor"], page["hasNextPage"]
+
+        # Descarta o resto incompleto para que os próximos commits fiquem legíveis
+        if valid_bytes < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_bytes)
+
+    def load(self) -> Tuple[List[Dict[str, Any]], Optional[str], bool]:
+        """Retorna (nós já coletados, último cursor confirmado, há próxima página)."""
+        nodes: List[Dict[str, Any]] = []
+        cursor = None
+        has_next = True
+        for page_nodes, cursor, has_next in self.iter_pages():
+            nodes.extend(page_nodes)
+        return nodes, cursor, has_next
+
+    def commit(self, nodes: List[Dict[str, Any]], end_cursor: Optional[str], has_next: bool):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        line = json.dumps({"endCursor": end_cursor, "hasNextPage": has_next, "nodes": nodes}, separators=(",", ":"))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self):
+        if self.exists():
+            os.remove(self.path)
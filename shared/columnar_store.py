@@ -0,0 +1,76 @@
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Tipo usado no schema para colunas de data/hora (gravadas como timestamp UTC)
+DATETIME = "datetime"
+
+
+def columnar_path(csv_path: str) -> str:
+    """Caminho do arquivo Parquet que acompanha um CSV."""
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def apply_schema(df: pd.DataFrame, schema: Dict[str, str]) -> pd.DataFrame:
+    """Converte as colunas presentes em df para os tipos do schema."""
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        if dtype == DATETIME:
+            df[col] = pd.to_datetime(df[col], utc=True, errors="coerce")
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def read_csv_typed(csv_path: str, schema: Dict[str, str], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Lê um CSV já com os tipos do schema, carregando apenas `columns`."""
+    wanted = columns if columns is not None else list(schema)
+    dtype = {c: t for c, t in schema.items() if t != DATETIME and c in wanted}
+    df = pd.read_csv(csv_path, usecols=lambda c: c in wanted, dtype=dtype)
+    return apply_schema(df, {c: t for c, t in schema.items() if t == DATETIME})
+
+
+def write_table(df: pd.DataFrame, path: str, schema: Dict[str, str]):
+    """Grava df em Parquet comprimido (zstd) com os tipos explícitos do schema."""
+    df = apply_schema(df.copy(), schema)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    df.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+    os.replace(tmp_path, path)
+
+
+def load_table(csv_path: str, schema: Dict[str, str], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Carrega um dataset tipado lendo apenas as colunas pedidas.
+
+    O CSV continua sendo a fonte; na primeira leitura (ou quando o CSV for mais
+    novo) ele é convertido uma única vez para um Parquet ao lado, com os tipos
+    do schema. As leituras seguintes vêm do Parquet, com projeção de colunas e
+    sem reconverter datas. Sem pyarrow instalado, lê o CSV tipado diretamente.
+    """
+    if not HAS_PYARROW:
+        return read_csv_typed(csv_path, schema, columns)
+
+    pq_path = columnar_path(csv_path)
+    csv_exists = os.path.exists(csv_path)
+    stale = not os.path.exists(pq_path) or (csv_exists and os.path.getmtime(pq_path) < os.path.getmtime(csv_path))
+    if not stale and csv_exists:
+        # Schema ampliado depois da conversão: refaz o Parquet
+        import pyarrow.parquet as pq
+        stale = not set(schema).issubset(pq.read_schema(pq_path).names)
+    if stale:
+        df = read_csv_typed(csv_path, schema)
+        write_table(df, pq_path, schema)
+        return df[columns] if columns is not None else df
+
+    # Reaplica o schema para que os dtypes sejam os mesmos da leitura do CSV
+    df = pd.read_parquet(pq_path, engine="pyarrow", columns=columns)
+    return apply_schema(df, {c: t for c, t in schema.items() if t != DATETIME})
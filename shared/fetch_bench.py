@@ -0,0 +1,195 @@
+"""
+Benchmark das coletas contra o servidor substituto local (shared/standin_server.py).
+
+Cada coleta roda em um processo próprio, dentro da pasta code do laboratório,
+apontada para o servidor local por GITHUB_GRAPHQL_URL/OPENAQ_BASE_URL e sem
+cache. O relatório traz páginas/s, latência p50/p99 das requisições e o tempo
+total de cada coleta, sem gastar limite de taxa das APIs reais.
+
+Uso (na raiz do repositório):
+    python -m shared.fetch_bench
+    python -m shared.fetch_bench --latency 0.05 --jitter 0.02 --rate-limit-every 25
+    python -m shared.fetch_bench --targets lab03.fetch_pull_requests --json bench.jsonl
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from .standin_server import StandInConfig, StandInServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RESULT_PREFIX = "__BENCH__"
+
+
+@dataclass
+class BenchTarget:
+    name: str
+    lab: str
+    module: str
+    # Expressão avaliada no processo filho; `target` é o módulo importado
+    call: str
+
+
+TARGETS = [
+    BenchTarget("lab01.fetch_repositories", "lab-01", "github_graphql",
+                "target.fetch_repositories({repos}, resume=False)"),
+    BenchTarget("lab01.fetch_repositories_partitioned", "lab-01", "github_graphql",
+                "target.fetch_repositories_partitioned({partitioned_repos})"),
+    BenchTarget("lab02.fetch_repositories", "lab-02", "github_graphql",
+                "target.fetch_repositories({repos}, resume=False)"),
+    BenchTarget("lab03.fetch_top_repositories", "lab-03", "gh_api",
+                "target.fetch_top_repositories({repos}, 100)"),
+    BenchTarget("lab03.fetch_pull_requests", "lab-03", "gh_api",
+                "[pr for i in range({pr_repos}) for pr in target.fetch_pull_requests(f'bench/repo{{i}}', {prs}, resume=False)]"),
+    BenchTarget("lab03.iter_pull_requests", "lab-03", "pr_crawler",
+                "[pr for _, prs in target.iter_pull_requests([f'bench/repo{{i}}' for i in range({pr_repos})], {prs}, resume=False) for pr in prs]"),
+    BenchTarget("lab04.fetch_locations_for_city", "lab-04", "openaq_api",
+                "[loc for city in target.cities for loc in target.fetch_locations_for_city(city)]"),
+    BenchTarget("lab04.fetch_sensor_data", "lab-04", "openaq_api",
+                "[row for sid in range({sensors}) for row in target.fetch_sensor_data(sid, yearly=False)]"),
+]
+
+_CHILD = """
+import json, sys, time
+sys.path.insert(0, ".")
+import {module} as target
+
+class _NoSleep:
+    # Desliga as pausas entre páginas do próprio módulo (o retry do cliente continua real)
+    sleep = staticmethod(lambda seconds: None)
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+if {no_throttle}:
+    target.time = _NoSleep()
+
+started = time.perf_counter()
+result = {call}
+elapsed = time.perf_counter() - started
+print({prefix!r} + json.dumps({{"elapsed": elapsed, "items": len(result)}}))
+"""
+
+
+@dataclass
+class BenchResult:
+    target: str
+    requests: int
+    pages: int
+    errors: int
+    items: int
+    elapsed: float
+    pages_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    ok: bool
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def run_target(target: BenchTarget, server: StandInServer, params: Dict[str, Any], no_throttle: bool = True) -> BenchResult:
+    server.stats.reset()
+    code = _CHILD.format(module=target.module, no_throttle=no_throttle,
+                         call=target.call.format(**params), prefix=RESULT_PREFIX)
+    env = dict(os.environ)
+    env.update({
+        "GITHUB_TOKEN": "stand-in",
+        "GITHUB_CACHE": "0",
+        "GITHUB_OFFLINE": "0",
+        "GITHUB_GRAPHQL_URL": server.graphql_url,
+        "OPENAQ_API_TOKEN": "stand-in",
+        "OPENAQ_BASE_URL": server.openaq_url,
+    })
+    proc = subprocess.run([sys.executable, "-c", code], cwd=os.path.join(ROOT, target.lab, "code"),
+                          env=env, capture_output=True, text=True)
+
+    summary: Optional[Dict[str, Any]] = None
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            summary = json.loads(line[len(RESULT_PREFIX):])
+    if summary is None:
+        print(f"[!] {target.name} falhou:\n{proc.stderr[-2000:]}", file=sys.stderr)
+
+    records = list(server.stats.records)
+    durations = [r.duration for r in records]
+    pages = sum(1 for r in records if r.status == 200)
+    elapsed = summary["elapsed"] if summary else math.nan
+    return BenchResult(
+        target=target.name,
+        requests=len(records),
+        pages=pages,
+        errors=len(records) - pages,
+        items=summary["items"] if summary else 0,
+        elapsed=elapsed,
+        pages_per_sec=pages / elapsed if summary and elapsed > 0 else math.nan,
+        p50_ms=_percentile(durations, 0.50) * 1000,
+        p99_ms=_percentile(durations, 0.99) * 1000,
+        ok=summary is not None,
+    )
+
+
+def format_table(results: List[BenchResult]) -> str:
+    header = f"{'coleta':<38} {'req':>5} {'págs':>5} {'erros':>5} {'itens':>6} {'tempo(s)':>9} {'págs/s':>8} {'p50(ms)':>8} {'p99(ms)':>8}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(
+            f"{r.target:<38} {r.requests:>5} {r.pages:>5} {r.errors:>5} {r.items:>6} "
+            f"{r.elapsed:>9.2f} {r.pages_per_sec:>8.1f} {r.p50_ms:>8.1f} {r.p99_ms:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark das coletas contra servidores substitutos locais")
+    parser.add_argument("--targets", nargs="*", default=None, help="coletas a medir (padrão: todas)")
+    parser.add_argument("--latency", type=float, default=0.01, help="latência fixa por resposta (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latência extra aleatória até este valor (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de respostas 502")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="recusa 1 a cada N requisições com Retry-After")
+    parser.add_argument("--retry-after", type=int, default=1, help="valor do Retry-After (s)")
+    parser.add_argument("--repos", type=int, default=300)
+    parser.add_argument("--partitioned-repos", type=int, default=3000)
+    parser.add_argument("--pr-repos", type=int, default=3)
+    parser.add_argument("--prs", type=int, default=300)
+    parser.add_argument("--sensors", type=int, default=30)
+    parser.add_argument("--keep-throttle", action="store_true", help="mantém as pausas entre páginas das coletas")
+    parser.add_argument("--json", default=None, help="anexa os resultados (JSON lines) a este arquivo")
+    args = parser.parse_args(argv)
+
+    config = StandInConfig(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit_every=args.rate_limit_every, retry_after=args.retry_after,
+        prs_per_repo=args.prs,
+    )
+    params = {"repos": args.repos, "partitioned_repos": args.partitioned_repos,
+              "pr_repos": args.pr_repos, "prs": args.prs, "sensors": args.sensors}
+    targets = [t for t in TARGETS if not args.targets or t.name in args.targets]
+
+    results = []
+    with StandInServer(config) as server:
+        for target in targets:
+            print(f"[bench] {target.name}...", flush=True)
+            results.append(run_target(target, server, params, no_throttle=not args.keep_throttle))
+
+    print()
+    print(format_table(results))
+
+    if args.json:
+        run = {"timestamp": time.time(), "config": asdict(config), "params": params}
+        with open(args.json, "a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps({**run, **asdict(r)}) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .response_cache import ResponseCache
+
+# GITHUB_GRAPHQL_URL aponta a coleta para outro servidor (ex.: o substituto local dos benchmarks)
+GQL_URL = os.getenv("GITHUB_GRAPHQL_URL", "https://api.github.com/graphql")
+
+
+class GraphQLError(Exception):
+    """Falha definitiva de uma requisição GraphQL (após esgotar as tentativas)."""
+
+    def __init__(self, message: str, status: Optional[int] = None, body: str = ""):
+        super().__init__(message)
+        self.status = status
+        self.body = body
+
+
+class GraphQLClient:
+    """
+    Cliente GraphQL do GitHub com sessão HTTP reaproveitada.
+
+    A sessão mantém um pool de conexões keep-alive (evita um handshake TCP+TLS
+    por página), negocia respostas comprimidas e concentra a política de
+    retry usada por todos os laboratórios. Com um ResponseCache, respostas já
+    obtidas são servidas do disco sem ir à rede.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        url: str = GQL_URL,
+        timeout: float = 30,
+        max_retries: int = 3,
+        backoff: float = 2,
+        pool_size: int = 10,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = cache
+        # Chamado com a espera (s) sempre que a API recusa por limite de taxa (403/429)
+        self.on_rate_limit: Optional[Callable[[float], None]] = None
+        self._local = threading.local()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        # Respeita o Retry-After enviado pelo GitHub em limites de taxa
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return int(retry_after)
+        return self.backoff * (attempt + 1)
+
+    def _wait(self, attempt: int, response: Optional[requests.Response] = None):
+        time.sleep(self._retry_delay(attempt, response))
+
+    def execute(self, query: str, variables: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Executa a query e retorna o campo "data" da resposta."""
+        if self.cache is not None:
+            cached = self.cache.get(query, variables)
+            if cached is not None:
+                self._local.cached = True
+                return cached
+        self._local.cached = False
+
+        payload = {"query": query, "variables": variables or {}}
+        response = None
+        last_error = ""
+
+        for attempt in range(self.max_retries):
+            try:
+                response = self.session.post(self.url, json=payload, timeout=timeout or self.timeout)
+            except requests.exceptions.RequestException as e:
+                last_error = str(e)
+                print(f"[ERRO] Problema de conexão: {e}, tentativa {attempt+1}/{self.max_retries}")
+                self._wait(attempt)
+                continue
+
+            if response.status_code != 200:
+                last_error = response.text[:300]
+                print(f"[AVISO] Falha {response.status_code}, tentativa {attempt+1}/{self.max_retries}")
+                if response.status_code in (403, 429) and self.on_rate_limit is not None:
+                    self.on_rate_limit(self._retry_delay(attempt, response))
+                self._wait(attempt, response)
+                continue
+
+            try:
+                body = response.json()
+            except ValueError as e:
+                last_error = f"JSON inválido: {e}"
+                print(f"[ERRO] Falha ao decodificar JSON da resposta: {e}")
+                self._wait(attempt)
+                continue
+
+            if body.get("data") and _only_not_found(body.get("errors")):
+                # Repositório inexistente (NOT_FOUND) não melhora com retry: o campo
+                # dele volta null e o chamador decide o que fazer
+                if self.cache is not None:
+                    self.cache.put(query, variables, body["data"])
+                return body["data"]
+
+            if body.get("errors") or not body.get("data"):
+                # Erros GraphQL costumam ser limites de taxa ou falhas transitórias
+                last_error = str(body.get("errors"))[:300]
+                print(f"[AVISO] Resposta com erros GraphQL, tentativa {attempt+1}/{self.max_retries}: {last_error}")
+                self._wait(attempt, response)
+                continue
+
+            if self.cache is not None:
+                self.cache.put(query, variables, body["data"])
+            return body["data"]
+
+        status = response.status_code if response is not None else None
+        print(f"[X] Falha na requisição GraphQL após {self.max_retries} tentativas. Status final={status}, corpo={last_error}")
+        raise GraphQLError(
+            f"GraphQL request failed after retries. Last status={status}, body={last_error}",
+            status=status,
+            body=last_error,
+        )
+
+    @property
+    def last_cached(self) -> bool:
+        """Indica se a última resposta desta thread veio do cache."""
+        return getattr(self._local, "cached", False)
+
+    @property
+    def offline(self) -> bool:
+        return self.cache is not None and self.cache.offline
+
+    def close(self):
+        self.session.close()
+
+
+def _only_not_found(errors: Optional[List[Dict[str, Any]]]) -> bool:
+    """Verdadeiro se a resposta só traz erros NOT_FOUND (ex.: repositório removido ou renomeado)."""
+    return bool(errors) and all(isinstance(e, dict) and e.get("type") == "NOT_FOUND" for e in errors)
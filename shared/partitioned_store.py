@@ -0,0 +1,149 @@
+import json
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from .columnar_store import DATETIME, HAS_PYARROW, apply_schema, read_csv_typed, write_table
+
+MANIFEST = "manifest.json"
+
+
+class PartitionedStore:
+    """
+    Dataset gravado em partições, uma por valor de `key_column` (ex.: repositório).
+
+    Cada partição é um arquivo próprio (Parquet, ou CSV sem pyarrow) e o
+    manifesto guarda, por partição, o arquivo, o número de linhas e o
+    intervalo de datas de `date_column`, além de metadados livres. Gravar ou
+    atualizar uma partição só reescreve o arquivo dela e a sua entrada no
+    manifesto; a leitura pode pedir só algumas partições, colunas ou um
+    intervalo de datas, e o manifesto descarta as partições fora dele sem abri-las.
+    """
+
+    def __init__(self, root: str, schema: Dict[str, str], key_column: str, date_column: Optional[str] = None):
+        self.root = root
+        self.schema = schema
+        self.key_column = key_column
+        self.date_column = date_column
+        self.manifest_path = os.path.join(root, MANIFEST)
+        self.manifest: Dict[str, Dict[str, Any]] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.isfile(self.manifest_path):
+            return {}
+        with open(self.manifest_path, encoding="utf-8") as f:
+            return json.load(f)["partitions"]
+
+    def _save_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key_column": self.key_column, "date_column": self.date_column,
+                       "partitions": self.manifest}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _file_name(self, key: str) -> str:
+        ext = ".parquet" if HAS_PYARROW else ".csv"
+        return re.sub(r"[^A-Za-z0-9._-]", "_", key) + ext
+
+    def keys(self) -> List[str]:
+        return sorted(self.manifest)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.manifest
+
+    def __len__(self) -> int:
+        return len(self.manifest)
+
+    def rows(self) -> int:
+        return sum(entry["rows"] for entry in self.manifest.values())
+
+    def meta(self, key: str) -> Dict[str, Any]:
+        """Metadados gravados junto com a partição (vazio se ela não existir)."""
+        return dict(self.manifest.get(key, {}).get("meta", {}))
+
+    def write(self, key: str, df: pd.DataFrame, **meta):
+        """Grava (ou substitui) a partição `key` e atualiza sua entrada no manifesto."""
+        file_name = self._file_name(key)
+        path = os.path.join(self.root, file_name)
+        if HAS_PYARROW:
+            write_table(df, path, self.schema)
+        else:
+            os.makedirs(self.root, exist_ok=True)
+            df.to_csv(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+
+        entry: Dict[str, Any] = {"file": file_name, "rows": int(len(df)), "updated": time.time(),
+                                 "meta": {**self.meta(key), **meta}}
+        if self.date_column and len(df):
+            dates = pd.to_datetime(df[self.date_column], utc=True)
+            entry["date_min"] = dates.min().isoformat()
+            entry["date_max"] = dates.max().isoformat()
+        self.manifest[key] = entry
+        self._save_manifest()
+
+    def read_partition(self, key: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        path = os.path.join(self.root, self.manifest[key]["file"])
+        if path.endswith(".parquet"):
+            df = pd.read_parquet(path, engine="pyarrow", columns=columns)
+            # Mesmos dtypes da leitura do CSV (o Parquet já guarda as datas em UTC)
+            return apply_schema(df, {c: t for c, t in self.schema.items() if t != DATETIME})
+        return read_csv_typed(path, self.schema, columns)
+
+    def select(self, keys: Optional[Iterable[str]] = None, since: Optional[str] = None,
+               until: Optional[str] = None) -> List[str]:
+        """Partições pedidas cujo intervalo de datas (pelo manifesto) cruza [since, until]."""
+        wanted = self.keys() if keys is None else [k for k in keys if k in self.manifest]
+        since_ts = pd.Timestamp(since, tz="UTC") if since else None
+        until_ts = pd.Timestamp(until, tz="UTC") if until else None
+        selected = []
+        for key in wanted:
+            entry = self.manifest[key]
+            if not entry["rows"]:
+                continue
+            if since_ts is not None and "date_max" in entry and pd.Timestamp(entry["date_max"]) < since_ts:
+                continue
+            if until_ts is not None and "date_min" in entry and pd.Timestamp(entry["date_min"]) > until_ts:
+                continue
+            selected.append(key)
+        return selected
+
+    def iter_partitions(self, keys: Optional[Iterable[str]] = None,
+                        columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+        """Lê as partições uma a uma, para passadas em streaming sem montar o dataset inteiro."""
+        for key in self.select(keys):
+            yield self.read_partition(key, columns)
+
+    def read(self, keys: Optional[Iterable[str]] = None, columns: Optional[List[str]] = None,
+             since: Optional[str] = None, until: Optional[str] = None,
+             where: Optional[Callable[[pd.DataFrame], pd.Series]] = None) -> pd.DataFrame:
+        """
+        Lê as partições pedidas (todas por padrão), só com `columns`. Com
+        since/until, filtra também as linhas pelo intervalo de `date_column`.
+        `where` recebe cada partição e devolve a máscara das linhas a manter;
+        o filtro é aplicado antes de juntar as partições, então as linhas
+        descartadas nunca ficam todas em memória ao mesmo tempo.
+        """
+        read_columns = columns
+        if columns is not None and (since or until) and self.date_column not in columns:
+            read_columns = columns + [self.date_column]
+        frames = []
+        for key in self.select(keys, since, until):
+            frame = self.read_partition(key, read_columns)
+            frames.append(frame[where(frame)] if where is not None else frame)
+        if not frames:
+            return apply_schema(pd.DataFrame(columns=columns or list(self.schema)), self.schema)
+
+        df = pd.concat(frames, ignore_index=True)
+        # concat de categorias diferentes vira object; reaplica o schema
+        df = apply_schema(df, {c: t for c, t in self.schema.items() if t == "category"})
+        if since:
+            df = df[df[self.date_column] >= pd.Timestamp(since, tz="UTC")]
+        if until:
+            df = df[df[self.date_column] <= pd.Timestamp(until, tz="UTC")]
+        if read_columns is not columns:
+            df = df[columns]
+        return df.reset_index(drop=True)
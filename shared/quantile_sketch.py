@@ -0,0 +1,126 @@
+import math
+import os
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Erro de posição dos quantis aproximados (ex.: 0.005 = 0,5%); 0 = quantis exatos
+RANK_ERROR_ENV = "QUANTILE_RANK_ERROR"
+
+
+class KLLSketch:
+    """
+    Sketch de quantis KLL: resume um fluxo de números em memória limitada e
+    responde quantis com erro de posição (rank) de aproximadamente 1.7/k.
+
+    Os valores entram no nível 0; quando um nível enche, ele é ordenado e
+    metade dos itens (alternados, a partir de um deslocamento aleatório) sobe
+    para o nível seguinte com o dobro do peso. Dois sketches podem ser
+    combinados com merge(), então cada worker/partição pode montar o seu e a
+    combinação mantém a mesma garantia de erro de um sketch único.
+    Enquanto cabem no nível 0 (até k valores), os quantis são exatos.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = 0):
+        if k < 8:
+            raise ValueError("k deve ser pelo menos 8")
+        self.k = k
+        self.n = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self._levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def for_error(cls, rank_error: float, seed: Optional[int] = 0) -> "KLLSketch":
+        """Sketch dimensionado para um erro de posição alvo (ex.: 0.01 = 1%)."""
+        return cls(k=max(8, math.ceil(1.7 / rank_error)), seed=seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def update(self, values: Iterable[float]):
+        """Adiciona um lote de valores (NaN são ignorados)."""
+        values = np.asarray(values, dtype="float64").ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.n += len(values)
+        lo, hi = float(values.min()), float(values.max())
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Incorpora outro sketch a este (in-place) e retorna self."""
+        if other.n == 0:
+            return self
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for level, items in enumerate(other._levels):
+            self._levels[level] = np.concatenate([self._levels[level], items])
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self):
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+            grew = level + 1 == len(self._levels)
+            if grew:
+                self._levels.append(np.empty(0))
+
+            items = np.sort(items)
+            # Com quantidade ímpar, o último item fica no nível atual
+            keep = items[-1:] if len(items) % 2 else items[:0]
+            paired = items[:len(items) - len(keep)]
+            offset = int(self._rng.integers(2))
+            self._levels[level + 1] = np.concatenate([self._levels[level + 1], paired[offset::2]])
+            self._levels[level] = keep
+            # Um nível novo reduz a capacidade dos de baixo: confere de novo desde o 0
+            level = 0 if grew else level + 1
+
+    def _weighted(self):
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(lv), 2 ** h, dtype="float64") for h, lv in enumerate(self._levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """Quantis aproximados (menor valor cuja posição acumulada alcança q*n)."""
+        if self.n == 0:
+            return [math.nan] * len(qs)
+        items, cumulative = self._weighted()
+        total = cumulative[-1]
+        out = []
+        for q in qs:
+            if q <= 0:
+                out.append(self.min)
+            elif q >= 1:
+                out.append(self.max)
+            else:
+                idx = int(np.searchsorted(cumulative, q * total, side="left"))
+                out.append(float(items[min(idx, len(items) - 1)]))
+        return out
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def __len__(self) -> int:
+        return self.n
+
+
+def default_rank_error() -> float:
+    """Erro de posição configurado em QUANTILE_RANK_ERROR (0 = quantis exatos, sem sketch)."""
+    return float(os.getenv(RANK_ERROR_ENV) or 0)
@@ -0,0 +1,138 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class CacheMissError(Exception):
+    """Resposta ausente do cache no modo de replay offline."""
+
+
+class ResponseCache:
+    """
+    Cache em disco de respostas GraphQL, endereçado pelo conteúdo da requisição.
+
+    A chave é o SHA-256 do texto da query + variáveis (JSON canônico). Cada
+    resposta é gravada comprimida (gzip) em <cache_dir>/<chave[:2]>/<chave>.json.gz.
+    Entradas expiram após `ttl` segundos e, quando o tamanho total ultrapassa
+    `max_bytes`, as menos usadas recentemente são removidas.
+
+    Com `offline=True` o cache vira a única fonte de dados: o TTL é ignorado e
+    uma entrada ausente gera CacheMissError em vez de ir à rede.
+    """
+
+    def __init__(self, cache_dir: str, ttl: Optional[float] = 3600, max_bytes: int = 512 * 1024 * 1024, offline: bool = False):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, default_dir: str) -> Optional["ResponseCache"]:
+        """
+        Configura o cache a partir de variáveis de ambiente (.env):
+        GITHUB_CACHE=0 desativa, GITHUB_CACHE_DIR, GITHUB_CACHE_TTL (segundos,
+        0 = sem expiração), GITHUB_CACHE_MAX_MB e GITHUB_OFFLINE=1 (replay).
+        """
+        offline = os.getenv("GITHUB_OFFLINE", "0") == "1"
+        if os.getenv("GITHUB_CACHE", "1") == "0" and not offline:
+            return None
+        ttl = float(os.getenv("GITHUB_CACHE_TTL", "3600"))
+        max_mb = float(os.getenv("GITHUB_CACHE_MAX_MB", "512"))
+        return cls(
+            os.getenv("GITHUB_CACHE_DIR", default_dir),
+            ttl=ttl if ttl > 0 else None,
+            max_bytes=int(max_mb * 1024 * 1024),
+            offline=offline,
+        )
+
+    @staticmethod
+    def make_key(query: str, variables: Optional[Dict[str, Any]]) -> str:
+        canonical = json.dumps({"query": query, "variables": variables or {}}, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def get(self, query: str, variables: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        key = self.make_key(query, variables)
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            if self.offline:
+                raise CacheMissError(f"Resposta não encontrada no cache (modo offline): {key}")
+            return None
+
+        if not self.offline and self.ttl is not None and time.time() - entry["stored_at"] > self.ttl:
+            return None
+
+        # Atualiza o mtime para que a remoção por tamanho siga a ordem LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["data"]
+
+    def put(self, query: str, variables: Optional[Dict[str, Any]], data: Dict[str, Any]):
+        if self.offline:
+            return
+        key = self.make_key(query, variables)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        entry = {"stored_at": time.time(), "data": data}
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(entry, f, separators=(",", ":"))
+
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self._account(os.path.getsize(path) - old_size)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_size, st.st_mtime
+
+    def _account(self, delta: int):
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        else:
+            self._total_bytes += delta
+
+    def _evict(self):
+        # Remove as entradas menos usadas até ficar em 90% do limite
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                os.remove(path)
+            self._total_bytes = 0
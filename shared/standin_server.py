@@ -0,0 +1,378 @@
+import base64
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+@dataclass
+class StandInConfig:
+    """
+    Comportamento do servidor substituto.
+
+    `latency`/`jitter` atrasam cada resposta (segundos). A cada
+    `rate_limit_every` requisições uma é recusada com `rate_limit_status` e o
+    cabeçalho Retry-After; `error_rate` é a fração de respostas 502.
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_every: int = 0
+    rate_limit_status: int = 403
+    retry_after: int = 1
+    total_repos: int = 5000
+    prs_per_repo: int = 300
+    locations_per_city: int = 20
+    sensors_per_location: int = 3
+    sensor_periods: int = 12
+    seed: int = 0
+
+
+@dataclass
+class RequestRecord:
+    endpoint: str
+    status: int
+    duration: float
+
+
+@dataclass
+class StandInStats:
+    records: List[RequestRecord] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, endpoint: str, status: int, duration: float):
+        with self.lock:
+            self.records.append(RequestRecord(endpoint, status, duration))
+
+    def reset(self):
+        with self.lock:
+            self.records.clear()
+
+
+# Data de criação do PR número 0 de cada repositório sintético
+PR_EPOCH = datetime(2020, 1, 1)
+
+
+def _cursor(offset: int) -> str:
+    return base64.b64encode(f"cursor:{offset}".encode()).decode()
+
+
+def _offset(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    return int(base64.b64decode(cursor).decode().split(":", 1)[1])
+
+
+def _page(total: int, first: int, after: Optional[str]) -> Tuple[range, Dict[str, Any]]:
+    start = _offset(after)
+    end = min(start + first, total)
+    return range(start, end), {"endCursor": _cursor(end) if end > start else after, "hasNextPage": end < total}
+
+
+class SyntheticGitHub:
+    """Dados sintéticos e determinísticos no formato da API GraphQL do GitHub."""
+
+    # Como na API real, uma busca só pagina pelos primeiros 1000 resultados
+    SEARCH_LIMIT = 1000
+
+    def __init__(self, config: StandInConfig):
+        self.config = config
+        # Estrelas decrescentes, como em "sort:stars"
+        self.stars = [max(2, int(400_000 / (i + 1) ** 0.9)) for i in range(config.total_repos)]
+
+    def repo(self, i: int) -> Dict[str, Any]:
+        rnd = random.Random(self.config.seed * 1_000_003 + i)
+        created = 2008 + rnd.randrange(16)
+        return {
+            "nameWithOwner": f"owner{i % 97}/repo{i}",
+            "stargazerCount": self.stars[i],
+            "createdAt": f"{created}-{rnd.randrange(1, 13):02d}-{rnd.randrange(1, 29):02d}T12:00:00Z",
+            "updatedAt": "2025-01-01T00:00:00Z",
+            "primaryLanguage": {"name": rnd.choice(["Java", "Python", "TypeScript", "Go", "C++"])},
+            "pullRequests": {"totalCount": rnd.randrange(0, 5000)},
+            "releases": {"totalCount": rnd.randrange(0, 300)},
+            "issues": {"totalCount": rnd.randrange(0, 8000)},
+            "closedIssues": {"totalCount": rnd.randrange(0, 4000)},
+            "defaultBranchRef": {"name": "main", "target": {"oid": f"{i:040x}"}},
+            "diskUsage": rnd.randrange(100, 500_000),
+        }
+
+    def _matching(self, search: str) -> List[int]:
+        # Filtros de estrelas usados pelas coletas: stars:>N, stars:>=N e stars:A..B
+        m = re.search(r"stars:(>=|>)?(\d+)(?:\.\.(\d+))?", search)
+        if not m:
+            return list(range(len(self.stars)))
+        op, lo, hi = m.group(1), int(m.group(2)), m.group(3)
+        if hi is not None:
+            return [i for i, s in enumerate(self.stars) if lo <= s <= int(hi)]
+        if op == ">":
+            return [i for i, s in enumerate(self.stars) if s > lo]
+        return [i for i, s in enumerate(self.stars) if s >= lo]
+
+    def search(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        m = re.search(r'search\(query:\s*"([^"]*)"', query)
+        search_text = m.group(1) if m else variables.get("searchQuery", "")
+        first = variables.get("pageSize", 1 if "first: 1" in query else 10)
+        after = variables.get("afterCursor", variables.get("after"))
+
+        matching = self._matching(search_text)
+        positions, page_info = _page(min(len(matching), self.SEARCH_LIMIT), first, after)
+        return {"search": {
+            "repositoryCount": len(matching),
+            "nodes": [self.repo(matching[p]) for p in positions],
+            "pageInfo": page_info,
+        }}
+
+    def pull_request(self, repo: str, i: int) -> Dict[str, Any]:
+        rnd = random.Random(f"{self.config.seed}:{repo}:{i}")
+        merged = rnd.random() < 0.7
+        # Como na API real, a ordem é por createdAt decrescente: PRs novos entram no início
+        number = self.config.prs_per_repo - i
+        created = PR_EPOCH + timedelta(hours=6 * number)
+        closed = created + timedelta(hours=rnd.randrange(12), minutes=30)
+        return {
+            "number": number,
+            "state": "MERGED" if merged else "CLOSED",
+            "merged": merged,
+            "createdAt": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "mergedAt": closed.strftime("%Y-%m-%dT%H:%M:%SZ") if merged else None,
+            "closedAt": closed.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "body": "x" * rnd.randrange(0, 2000),
+            "changedFiles": rnd.randrange(1, 60),
+            "additions": rnd.randrange(0, 3000),
+            "deletions": rnd.randrange(0, 1500),
+            "comments": {"totalCount": rnd.randrange(0, 40)},
+            "reviewThreads": {"totalCount": rnd.randrange(0, 20)},
+            "participants": {"totalCount": rnd.randrange(1, 10)},
+            "reviews": {"totalCount": rnd.randrange(0, 15)},
+        }
+
+    def pull_requests(self, repo: str, first: int, after: Optional[str]) -> Dict[str, Any]:
+        positions, page_info = _page(self.config.prs_per_repo, first, after)
+        return {"pullRequests": {
+            "totalCount": self.config.prs_per_repo,
+            "nodes": [self.pull_request(repo, i) for i in positions],
+            "pageInfo": page_info,
+        }}
+
+    def pull_requests_batch(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        # Aliases rN: repository(owner: $oN, name: $nN) { pullRequests(first: $fN, after: $aN) }
+        return {
+            f"r{i}": self.pull_requests(f"{variables[f'o{i}']}/{variables[f'n{i}']}", variables[f"f{i}"], variables.get(f"a{i}"))
+            for i in map(int, re.findall(r"\br(\d+): repository\(", query))
+        }
+
+    def execute(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        if "pullRequests(" in query and "repository(" in query:
+            if "owner" not in variables:
+                return self.pull_requests_batch(query, variables)
+            repo = f"{variables['owner']}/{variables['name']}"
+            return {"repository": self.pull_requests(repo, variables["pageSize"], variables.get("after"))}
+        return self.search(query, variables)
+
+
+class SyntheticOpenAQ:
+    """Dados sintéticos e determinísticos no formato da API v3 do OpenAQ."""
+
+    POLLUTANTS = [(2, "pm25", "µg/m³"), (1, "pm10", "µg/m³"), (7, "no2", "ppb"), (10, "o3", "ppb")]
+
+    def __init__(self, config: StandInConfig):
+        self.config = config
+
+    def locations(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        lat, lon = (float(v) for v in params.get("coordinates", ["0,0"])[0].split(","))
+        city_key = int(abs(lat * 1000) + abs(lon * 1000))
+        limit = int(params.get("limit", ["100"])[0])
+        results = []
+        for j in range(min(limit, self.config.locations_per_city)):
+            loc_id = city_key * 100 + j
+            sensors = []
+            for k in range(self.config.sensors_per_location):
+                pid, pname, units = self.POLLUTANTS[(j + k) % len(self.POLLUTANTS)]
+                sensors.append({
+                    "id": loc_id * 10 + k,
+                    "name": f"{pname} {units}",
+                    "parameter": {"id": pid, "name": pname, "displayName": pname.upper(), "units": units},
+                })
+            results.append({
+                "id": loc_id,
+                "name": f"Estação {j}",
+                "locality": None,
+                "country": {"name": "Brazil"},
+                "coordinates": {"latitude": lat + j * 0.001, "longitude": lon - j * 0.001},
+                "datetimeFirst": {"utc": "2016-01-01T00:00:00Z"},
+                "datetimeLast": {"utc": "2025-01-01T00:00:00Z"},
+                "sensors": sensors,
+            })
+        return {"meta": {"found": len(results)}, "results": results}
+
+    def sensor_days(self, sensor_id: int, yearly: bool) -> Dict[str, Any]:
+        rnd = random.Random(f"{self.config.seed}:{sensor_id}:{yearly}")
+        pid, pname, units = self.POLLUTANTS[sensor_id % len(self.POLLUTANTS)]
+        results = []
+        for p in range(self.config.sensor_periods):
+            if yearly:
+                start, end = f"{2013 + p}-01-01T00:00:00Z", f"{2014 + p}-01-01T00:00:00Z"
+            else:
+                year, month = 2020 + p // 12, 1 + p % 12
+                start = f"{year}-{month:02d}-01T00:00:00Z"
+                end = f"{year + month // 12}-{month % 12 + 1:02d}-01T00:00:00Z"
+            avg = round(rnd.uniform(5, 60), 2)
+            expected = 365 if yearly else 30
+            observed = rnd.randrange(expected // 2, expected + 1)
+            results.append({
+                "value": avg,
+                "parameter": {"id": pid, "name": pname, "units": units},
+                "period": {"datetimeFrom": {"utc": start}, "datetimeTo": {"utc": end}},
+                "summary": {"avg": avg, "min": round(avg / 3, 2), "max": round(avg * 3, 2), "median": round(avg * 0.9, 2)},
+                "coverage": {"percentCoverage": round(100 * observed / expected, 1), "observedCount": observed, "expectedCount": expected},
+            })
+        return {"meta": {"found": len(results)}, "results": results}
+
+
+class StandInServer:
+    """
+    Servidor HTTP local que substitui a API GraphQL do GitHub (POST /graphql)
+    e a API v3 do OpenAQ (GET /v3/...), com paginação por cursor, latência
+    configurável e falhas injetadas (5xx e limite de taxa com Retry-After).
+
+    Uso:
+        with StandInServer(StandInConfig(latency=0.02)) as server:
+            os.environ["GITHUB_GRAPHQL_URL"] = server.graphql_url
+            os.environ["OPENAQ_BASE_URL"] = server.openaq_url
+
+    Cada requisição atendida fica registrada em `stats` (endpoint, status, duração).
+    """
+
+    def __init__(self, config: Optional[StandInConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StandInConfig()
+        self.github = SyntheticGitHub(self.config)
+        self.openaq = SyntheticOpenAQ(self.config)
+        self.stats = StandInStats()
+        self._rng = random.Random(self.config.seed)
+        self._counter = 0
+        self._counter_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def graphql_url(self) -> str:
+        return f"{self.url}/graphql"
+
+    @property
+    def openaq_url(self) -> str:
+        return f"{self.url}/v3"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _fault(self) -> Optional[int]:
+        with self._counter_lock:
+            self._counter += 1
+            n = self._counter
+            roll = self._rng.random()
+        cfg = self.config
+        if cfg.rate_limit_every and n % cfg.rate_limit_every == 0:
+            return cfg.rate_limit_status
+        if cfg.error_rate and roll < cfg.error_rate:
+            return 502
+        return None
+
+    def _delay(self):
+        cfg = self.config
+        if cfg.latency or cfg.jitter:
+            with self._counter_lock:
+                extra = self._rng.random() * cfg.jitter
+            time.sleep(cfg.latency + extra)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, endpoint: str, started: float, status: int, body: Dict[str, Any]):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if status in (403, 429):
+                    self.send_header("Retry-After", str(server.config.retry_after))
+                self.end_headers()
+                self.wfile.write(payload)
+                server.stats.add(endpoint, status, time.perf_counter() - started)
+
+            def _respond(self, endpoint: str, started: float, build):
+                server._delay()
+                fault = server._fault()
+                if fault is not None:
+                    self._send(endpoint, started, fault, {"message": "stand-in fault"})
+                    return
+                try:
+                    body = build()
+                except (KeyError, ValueError, IndexError) as e:
+                    self._send(endpoint, started, 400, {"message": f"bad request: {e}"})
+                    return
+                self._send(endpoint, started, 200, body)
+
+            def do_POST(self):
+                started = time.perf_counter()
+                length = int(self.headers.get("Content-Length", "0"))
+                raw = self.rfile.read(length)
+                if urlparse(self.path).path != "/graphql":
+                    self._send(self.path, started, 404, {"message": "not found"})
+                    return
+
+                def build():
+                    request = json.loads(raw or b"{}")
+                    return {"data": server.github.execute(request.get("query", ""), request.get("variables") or {})}
+
+                self._respond("graphql", started, build)
+
+            def do_GET(self):
+                started = time.perf_counter()
+                parsed = urlparse(self.path)
+                params = parse_qs(parsed.query)
+                path = parsed.path
+                if path == "/v3/locations":
+                    self._respond("openaq/locations", started, lambda: server.openaq.locations(params))
+                    return
+                m = re.fullmatch(r"/v3/sensors/(\d+)/days/(yearly|monthly)", path)
+                if m:
+                    sensor_id, period = int(m.group(1)), m.group(2)
+                    self._respond(f"openaq/sensors/{period}", started,
+                                  lambda: server.openaq.sensor_days(sensor_id, period == "yearly"))
+                    return
+                self._send(path, started, 404, {"message": "not found"})
+
+        return Handler